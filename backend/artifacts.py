@@ -0,0 +1,48 @@
+# backend/artifacts.py
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Converted JSONs live next to the code, one folder per pet
+CONVERTED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Files", "Converted_JSONs")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def converted_json_path(petId: int, original_filename: str) -> str:
+    return os.path.join(CONVERTED_DIR, str(petId), original_filename + ".json")
+
+
+def write_json(path: str, data: dict):
+    # Write to a private temp name then rename, so readers never see a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _write_logged(path: str, data: dict):
+    try:
+        write_json(path, data)
+    except Exception as e:
+        print(f"Failed to persist {path}: {e}")
+
+
+def persist_json_async(path: str, data: dict):
+    """Persist an extraction artifact off the request path; failures are logged, not raised."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifacts")
+        return _executor.submit(_write_logged, path, data)
+
+
+def shutdown_artifacts():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
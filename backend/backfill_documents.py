@@ -0,0 +1,50 @@
+# backend/backfill_documents.py
+# Index extraction artifacts written before the documents table existed, so
+# /auth/files/user keeps listing older uploads. The original PDF is gone by then,
+# so size and content hash describe the converted JSON instead.
+# Run with: python -m backend.backfill_documents
+import json
+import os
+from datetime import datetime, timezone
+
+from backend.artifacts import CONVERTED_DIR
+from backend.database import SessionLocal
+from backend.extraction_cache import hash_file
+from backend.ingest import stage_document
+from backend.models import Pet
+
+
+def backfill(db) -> int:
+    if not os.path.isdir(CONVERTED_DIR):
+        return 0
+    pet_ids = {pet_id for (pet_id,) in db.query(Pet.id)}
+    indexed = 0
+    for folder in sorted(os.listdir(CONVERTED_DIR)):
+        if not folder.isdigit() or int(folder) not in pet_ids:
+            continue
+        pet_id = int(folder)
+        pet_dir = os.path.join(CONVERTED_DIR, folder)
+        for name in sorted(os.listdir(pet_dir)):
+            if not name.lower().endswith(".json"):
+                continue
+            path = os.path.join(pet_dir, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    extracted_json = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            stat = os.stat(path)
+            stage_document(
+                db, extracted_json, pet_id, name[:-len(".json")], stat.st_size, hash_file(path), path,
+                created_at=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            )
+            indexed += 1
+        db.commit()
+    return indexed
+
+
+if __name__ == "__main__":
+    with SessionLocal() as db:
+        count = backfill(db)
+    print(f"Indexed {count} converted JSON file(s) (already indexed ones are left as they are)")
@@ -0,0 +1,46 @@
+# backend/backfill_lab_values.py
+# Populate lab_tests.value_num for rows ingested before the column existed.
+# Run with: python -m backend.backfill_lab_values
+from sqlalchemy import bindparam, update
+
+from backend.database import SessionLocal
+from backend.lab_values import parse_numeric_value
+from backend.models import LabTest
+
+BATCH_SIZE = 1000
+
+
+def backfill(db) -> int:
+    updated = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.query(LabTest.id, LabTest.value)
+            .filter(LabTest.id > last_id, LabTest.value_num.is_(None))
+            .order_by(LabTest.id)
+            .limit(BATCH_SIZE)
+            .all()
+        )
+        if not rows:
+            break
+        params = [
+            {"row_id": row.id, "value_num": parse_numeric_value(row.value)}
+            for row in rows
+        ]
+        params = [p for p in params if p["value_num"] is not None]
+        if params:
+            table = LabTest.__table__
+            db.connection().execute(
+                update(table).where(table.c.id == bindparam("row_id")).values(value_num=bindparam("value_num")),
+                params,
+            )
+            updated += len(params)
+        db.commit()
+        last_id = rows[-1].id
+    return updated
+
+
+if __name__ == "__main__":
+    with SessionLocal() as db:
+        count = backfill(db)
+    print(f"Backfilled value_num for {count} lab test rows")
@@ -0,0 +1,378 @@
+# backend/bench_ingest.py
+# Benchmark the PDF ingestion pipeline offline: fixture PDFs -> markdown/OCR -> LLM -> DB.
+# The LLM is a FakeBackend replaying recorded responses (or synthesizing them), so runs
+# are repeatable and cost nothing. Each (fixture, concurrency) pair runs in a fresh
+# interpreter against a scratch SQLite DB, so peak RSS and caches don't leak between runs.
+# Run with: python -m backend.bench_ingest [--concurrency 1 4 8] [--rounds N] [--out results.json]
+#           [--fixtures DIR] [--responses FILE] [--record] [--llm-latency S] [--force-llm]
+import argparse
+import hashlib
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_TESTS = [
+    ("ALT", "U/L", "10 - 125"), ("AST", "U/L", "0 - 50"), ("ALP", "U/L", "23 - 212"),
+    ("BUN", "mg/dL", "7 - 27"), ("Creatinine", "mg/dL", "0.5 - 1.8"), ("Glucose", "mg/dL", "74 - 143"),
+    ("Total Protein", "g/dL", "5.2 - 8.2"), ("Albumin", "g/dL", "2.3 - 4.0"), ("Calcium", "mg/dL", "7.9 - 12.0"),
+    ("Phosphorus", "mg/dL", "2.5 - 6.8"), ("Cholesterol", "mg/dL", "110 - 320"), ("WBC", "K/uL", "5.05 - 16.76"),
+    ("RBC", "M/uL", "5.65 - 8.87"), ("HCT", "%", "37.3 - 61.7"), ("Platelets", "K/uL", "148 - 484"),
+]
+
+
+# ---- fixtures -------------------------------------------------------------------
+
+def _report_rows(page_no: int) -> list[tuple[str, float, str, str]]:
+    rows = []
+    for n, (name, unit, ref) in enumerate(_TESTS):
+        low, high = (float(x) for x in ref.split(" - "))
+        rows.append((name, round(low + (high - low) * (((page_no + 1) * (n + 3)) % 11) / 10, 2), unit, ref))
+    return rows
+
+
+def _report_header(page_no: int) -> list[str]:
+    return [
+        "PetWell Reference Laboratory",
+        f"Patient: Bench   Species: Canine   Page {page_no + 1}",
+        f"Date Collected: 2024-{(page_no % 12) + 1:02d}-14",
+    ]
+
+
+def _report_lines(page_no: int) -> list[str]:
+    lines = _report_header(page_no) + ["", f"{'Test':<16}{'Result':>10}  {'Units':<8}{'Reference Range':<16}"]
+    for name, value, unit, ref in _report_rows(page_no):
+        lines.append(f"{name:<16}{value:>10}  {unit:<8}{ref:<16}")
+    return lines
+
+
+def _text_pdf(pages: int):
+    """Fixed-width text layout; pymupdf4llm renders it as a one-column table, so it goes to the LLM."""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        y = 72
+        for line in _report_lines(p):
+            page.insert_text((54, y), line, fontname="cour", fontsize=10)
+            y += 14
+    return doc
+
+
+def _ruled_pdf(pages: int):
+    """Results in a ruled grid, which comes out as a real markdown table for the table parser."""
+    import fitz  # PyMuPDF
+
+    columns = (54, 200, 290, 360, 520)
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        y = 72
+        for line in _report_header(p):
+            page.insert_text((54, y), line, fontsize=10)
+            y += 16
+        y += 8
+        rows = [("Test", "Result", "Units", "Reference Range")] + [
+            (name, str(value), unit, ref) for name, value, unit, ref in _report_rows(p)
+        ]
+        for row in rows:
+            for i, cell in enumerate(row):
+                page.draw_rect(fitz.Rect(columns[i], y, columns[i + 1], y + 18), color=(0, 0, 0), width=0.5)
+                page.insert_text((columns[i] + 4, y + 13), cell, fontsize=9)
+            y += 18
+    return doc
+
+
+def _rasterize(doc, keep_text=lambda i: False, dpi: int = 150):
+    """Copy `doc`, replacing pages with images of themselves (no text layer) unless kept."""
+    import fitz  # PyMuPDF
+
+    out = fitz.open()
+    for i, page in enumerate(doc):
+        if keep_text(i):
+            out.insert_pdf(doc, from_page=i, to_page=i)
+            continue
+        pix = page.get_pixmap(dpi=dpi)
+        scanned = out.new_page(width=page.rect.width, height=page.rect.height)
+        scanned.insert_image(scanned.rect, pixmap=pix)
+    return out
+
+
+def build_fixtures(dest: str) -> dict[str, str]:
+    """Write the default corpus: text, ruled-table, scanned, mixed (alternating) and many-page reports."""
+    corpus = {
+        "text": lambda: _text_pdf(2),
+        "ruled": lambda: _ruled_pdf(2),
+        "scanned": lambda: _rasterize(_text_pdf(2)),
+        "mixed": lambda: _rasterize(_text_pdf(4), keep_text=lambda i: i % 2 == 0),
+        "many_page": lambda: _text_pdf(40),
+    }
+    paths = {}
+    for name, make in corpus.items():
+        path = os.path.join(dest, f"{name}.pdf")
+        with make() as doc:
+            doc.save(path)
+        paths[name] = path
+    return paths
+
+
+# ---- child: one scenario in a fresh interpreter ------------------------------------
+
+def _content_key(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+_ROW_RE = re.compile(r"^\s*([A-Za-z][A-Za-z ]*?)\s+(-?\d+(?:\.\d+)?)\s+(\S+)\s+(\d[\d.]*\s*-\s*\d[\d.]*)\s*$")
+_DATE_RE = re.compile(r"Date Collected:\s*(\d{4}-\d{2}-\d{2})")
+
+
+def _synthesize(content: str) -> str:
+    # Stand-in for the model when there's no recording: read the fixture layout back
+    visits = {}
+    date = "unknown"
+    for line in content.replace("`", "").replace("*", "").splitlines():
+        # pymupdf4llm wraps rows in table pipes, one cell or several
+        line = line.strip().strip("|").replace("|", "  ")
+        found = _DATE_RE.search(line)
+        if found:
+            date = found.group(1)
+            continue
+        row = _ROW_RE.match(line)
+        if row:
+            name, value, unit, ref = row.groups()
+            visit = visits.setdefault(date, {"visit_date": date, "records": [], "notes": ""})
+            visit["records"].append({"test_name": name, "value": value, "unit": unit, "reference_range": ref})
+    return json.dumps({"visits": list(visits.values())})
+
+
+def _make_backend(spec: dict):
+    from .llm_client import FakeBackend, get_llm_client
+
+    responses = {}
+    if spec.get("responses") and os.path.exists(spec["responses"]):
+        with open(spec["responses"], "r", encoding="utf-8") as f:
+            responses = json.load(f)
+
+    if spec.get("record"):
+        # Call the configured live backend and keep its answers for later replays
+        live = get_llm_client().backend
+
+        def responder(prompt, content):
+            text = live.generate(prompt, content, timeout_s=spec["llm_deadline_s"]).text
+            responses[_content_key(content)] = text
+            return text
+    else:
+        def responder(prompt, content):
+            recorded = responses.get(_content_key(content))
+            if recorded:
+                return recorded
+            text = _synthesize(content)
+            if not any(v["records"] for v in json.loads(text)["visits"]):
+                empty_synthesized.append(_content_key(content))
+            return text
+
+    empty_synthesized = []
+    return FakeBackend(responder, latency_s=spec["llm_latency_s"]), responses, empty_synthesized
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_scenario(spec: dict) -> dict:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from . import artifacts, ocr
+    from .config import settings
+    from .database import SessionLocal
+    from .init_db import init_schema
+    from .llm_client import set_llm_backend
+    from .llm_parser import extract_data_from_pdf
+    from .models import Pet, User
+    from .stages import record
+    from .write_queue import shutdown_writer
+
+    artifacts.CONVERTED_DIR = os.path.join(spec["workdir"], "converted")
+    init_schema()
+    files = spec["concurrency"] * spec["rounds"]
+    with SessionLocal() as db:
+        user = User(name="bench", email=f"bench-{time.time_ns()}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        pets = [Pet(name=f"bench-{i}", owner_id=user.id) for i in range(files)]
+        db.add_all(pets)
+        db.commit()
+        pet_ids = [p.id for p in pets]
+
+    backend, responses, empty_synthesized = _make_backend({**spec, "llm_deadline_s": settings.LLM_DEADLINE_S})
+    set_llm_backend(backend)
+    with open(spec["pdf"], "rb") as f:
+        pdf = f.read()
+
+    def one(pet_id: int) -> dict:
+        started = time.perf_counter()
+        with record() as timings:
+            result = extract_data_from_pdf(pdf, pet_id, os.path.basename(spec["pdf"]))
+        return {
+            "total_s": time.perf_counter() - started,
+            "stages": dict(timings),
+            "path": result.get("extraction", {}).get("path"),
+            "records": sum(len(v.get("records", [])) for v in result.get("visits", [])),
+        }
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=spec["concurrency"]) as pool:
+        per_file = list(pool.map(one, pet_ids))
+    wall_s = time.perf_counter() - started
+
+    artifacts.shutdown_artifacts()
+    ocr.shutdown_ocr_pool()
+    shutdown_writer()
+    if spec.get("record") and spec.get("responses"):
+        with open(spec["responses"], "w", encoding="utf-8") as f:
+            json.dump(responses, f, indent=2)
+
+    # A run that ingests nothing only times empty transactions; don't report it as a result
+    if empty_synthesized:
+        raise RuntimeError(
+            f"{len(empty_synthesized)} synthesized LLM response(s) had no records; "
+            "the fixture layout wasn't recognized (record real responses with --record)"
+        )
+    empty_files = sum(1 for r in per_file if r["records"] == 0)
+    if empty_files:
+        raise RuntimeError(f"{empty_files} of {files} file(s) produced no records")
+
+    stage_names = sorted({name for r in per_file for name in r["stages"]})
+    return {
+        "fixture": spec["fixture"],
+        "concurrency": spec["concurrency"],
+        "files": files,
+        "wall_s": wall_s,
+        "throughput_files_per_s": files / wall_s if wall_s else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "llm_calls": len(backend.calls),
+        "paths": sorted({r["path"] for r in per_file if r["path"]}),
+        "records_per_file": per_file[0]["records"] if per_file else 0,
+        "total_s": {
+            "median": statistics.median(r["total_s"] for r in per_file),
+            "p95": _percentile([r["total_s"] for r in per_file], 95),
+        },
+        "stages": {
+            name: {
+                "median": statistics.median(r["stages"].get(name, 0.0) for r in per_file),
+                "p95": _percentile([r["stages"].get(name, 0.0) for r in per_file], 95),
+            }
+            for name in stage_names
+        },
+    }
+
+
+def _spawn(spec: dict, force_llm: bool) -> dict:
+    env = {
+        **os.environ,
+        "DATABASE_URL": "sqlite:///" + os.path.join(spec["workdir"], "bench.db").replace("\\", "/"),
+        "EXTRACTION_CACHE_ENABLED": "false",
+    }
+    if not spec.get("record"):
+        env["LLM_BACKEND"] = "fake"
+    if force_llm:
+        env["TABLE_PARSER_ENABLED"] = "false"
+    proc = subprocess.run(
+        [sys.executable, "-m", "backend.bench_ingest", "--child", json.dumps(spec)],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if proc.returncode != 0:
+        error = (proc.stderr.strip().splitlines() or ["exited with status %d" % proc.returncode])[-1]
+        return {"fixture": spec["fixture"], "concurrency": spec["concurrency"], "error": error}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--rounds", type=int, default=3, help="files per worker in each scenario")
+    parser.add_argument("--fixtures", help="directory of PDFs to use instead of the generated corpus")
+    parser.add_argument("--responses", help="JSON file of recorded LLM responses keyed by content hash")
+    parser.add_argument("--record", action="store_true", help="call the live LLM and save responses to --responses")
+    parser.add_argument("--llm-latency", type=float, default=1.5, help="simulated seconds per LLM call")
+    parser.add_argument("--force-llm", action="store_true", help="disable the table parser fast path")
+    parser.add_argument("--out", help="write results as JSON to this path")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(json.loads(args.child))))
+        return
+    if args.record and not args.responses:
+        parser.error("--record needs --responses")
+
+    with tempfile.TemporaryDirectory(prefix="petwell-bench-") as tmp:
+        if args.fixtures:
+            fixtures = {
+                os.path.splitext(name)[0]: os.path.join(args.fixtures, name)
+                for name in sorted(os.listdir(args.fixtures))
+                if name.lower().endswith(".pdf")
+            }
+        else:
+            fixtures = build_fixtures(tmp)
+
+        scenarios = []
+        for fixture, path in fixtures.items():
+            for concurrency in args.concurrency:
+                workdir = tempfile.mkdtemp(dir=tmp)
+                spec = {
+                    "fixture": fixture,
+                    "pdf": os.path.abspath(path),
+                    "workdir": workdir,
+                    "concurrency": concurrency,
+                    "rounds": args.rounds,
+                    "responses": os.path.abspath(args.responses) if args.responses else None,
+                    "record": args.record,
+                    "llm_latency_s": 0.0 if args.record else args.llm_latency,
+                }
+                result = _spawn(spec, args.force_llm)
+                scenarios.append(result)
+                if "error" in result:
+                    print(f"{fixture:>10} x{concurrency:<3} FAILED: {result['error']}")
+                    continue
+                stages = "  ".join(f"{k}={v['median'] * 1000:.0f}ms" for k, v in result["stages"].items())
+                print(
+                    f"{fixture:>10} x{concurrency:<3} {result['throughput_files_per_s']:6.2f} files/s"
+                    f"  p50 {result['total_s']['median']:6.2f}s  rss {result['peak_rss_mb']} MB  {stages}"
+                )
+
+    result = {
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "llm_latency_s": args.llm_latency,
+        "force_llm": args.force_llm,
+        "scenarios": scenarios,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if any("error" in s for s in scenarios):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# backend/bench_startup.py
+# Measure cold import time of the app and latency of the first requests.
+# Run with: python -m backend.bench_startup [--runs N] [--out results.json]
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+_PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import backend.main as m
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(m.app) as client:
+    t2 = time.perf_counter()
+    client.get("/")
+    t3 = time.perf_counter()
+    client.get("/")
+    t4 = time.perf_counter()
+heavy = [name for name in ("google.generativeai", "fitz", "pymupdf4llm", "pytesseract", "PIL.Image")
+         if name in __import__("sys").modules]
+print(json.dumps({
+    "import_s": t1 - t0,
+    "lifespan_startup_s": t2 - t1,
+    "first_request_s": t3 - t2,
+    "second_request_s": t4 - t3,
+    "heavy_modules_loaded": heavy,
+}))
+"""
+
+
+def run_once() -> dict:
+    # A fresh interpreter per run so nothing is already cached in sys.modules
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--out", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    metrics = ("import_s", "lifespan_startup_s", "first_request_s", "second_request_s")
+    summary = {
+        m: {
+            "median": statistics.median(r[m] for r in runs),
+            "min": min(r[m] for r in runs),
+            "max": max(r[m] for r in runs),
+        }
+        for m in metrics
+    }
+    result = {
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "summary": summary,
+        "heavy_modules_loaded": runs[-1]["heavy_modules_loaded"],
+    }
+
+    for m in metrics:
+        print(f"{m:>20}: median {summary[m]['median'] * 1000:8.1f} ms")
+    print(f"heavy modules loaded at startup: {result['heavy_modules_loaded'] or 'none'}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
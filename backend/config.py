@@ -2,11 +2,97 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
+    # run schema creation/migrations in the app lifespan; disable when migrating as a deploy step
+    AUTO_MIGRATE: bool = True
+
+    # database; the async engine derives its URL (aiosqlite/asyncpg) unless ASYNC_DATABASE_URL is set
+    DATABASE_URL: str = "sqlite:///./sql_app.db"
+    ASYNC_DATABASE_URL: str | None = None
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_ECHO: bool = False
+
+    # "production" enables WAL + tuned pragmas and routes ingestion writes through one writer thread
+    SQLITE_PROFILE: str = "default"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    WRITE_BATCH_MAX: int = 32
+    WRITE_BATCH_WAIT_MS: int = 20
+
     JWT_SECRET: str = "change-me"
     JWT_ALG: str = "HS256"
     ACCESS_TTL_MIN: int = 15
     REFRESH_TTL_DAYS: int = 14
 
+    # cache of authenticated principals / decoded access tokens
+    AUTH_CACHE_TTL_S: int = 30
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+
+    # upload size limits
+    MAX_PDF_UPLOAD_MB: int = 10
+    MAX_IMAGE_UPLOAD_MB: int = 10
+
+    # pet photo derivatives (thumb is square-cropped, medium bounded) and static media serving
+    PET_IMAGE_THUMB_PX: int = 256
+    PET_IMAGE_MEDIUM_PX: int = 1024
+    PET_IMAGE_FORMAT: str = "webp"
+    PET_IMAGE_QUALITY: int = 80
+    IMAGE_WORKERS: int = 1
+    # files newer than this are never collected: an upload may not have committed its reference yet
+    IMAGE_GC_MIN_AGE_S: int = 600
+    MEDIA_URL: str = "/media"
+    MEDIA_MAX_AGE_S: int = 365 * 24 * 3600
+
+    # background jobs for PDF extraction
+    JOB_BACKEND: str = "local"
+    JOB_WORKERS: int = 2
+    JOB_MAX_PENDING: int = 32
+    JOB_RETAIN: int = 500
+
+    # content-addressed extraction cache; disable to force every upload through the pipeline
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 1000
+    EXTRACTION_CACHE_MAX_AGE_DAYS: int = 90
+
+    # LLM client: "gemini" or "fake" (offline), rate limit, concurrency, retries, deadline
+    LLM_BACKEND: str = "gemini"
+    LLM_MODEL: str = "models/gemini-2.5-flash-lite"
+    LLM_RATE_PER_S: float = 2.0
+    LLM_BURST: int = 5
+    LLM_MAX_IN_FLIGHT: int = 4
+    LLM_MAX_RETRIES: int = 3
+    LLM_BACKOFF_BASE_S: float = 0.5
+    LLM_BACKOFF_MAX_S: float = 8.0
+    LLM_DEADLINE_S: float = 120.0
+    # long reports are split into page-aligned chunks extracted concurrently
+    LLM_CHUNK_MAX_CHARS: int = 30000
+    LLM_CHUNK_CONCURRENCY: int = 4
+    LLM_CHUNK_HEADER_CHARS: int = 1500
+
+    # Prometheus metrics at /metrics
+    METRICS_ENABLED: bool = True
+
+    # batch uploads: files per request, and table parser/LLM steps overlapping conversion
+    BATCH_MAX_FILES: int = 20
+    BATCH_LLM_CONCURRENCY: int = 2
+
+    # rule-based table extraction; below these thresholds the LLM is used instead
+    TABLE_PARSER_ENABLED: bool = True
+    TABLE_PARSER_MIN_CONFIDENCE: float = 0.8
+    TABLE_PARSER_MIN_RECORDS: int = 3
+
+    # per-page OCR for scanned pages (OCR_WORKERS=0 means one per CPU)
+    TESSERACT_CMD: str | None = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+    OCR_WORKERS: int = 0
+    OCR_DPI: int = 300
+    OCR_GRAYSCALE: bool = True
+    OCR_PSM: int = 3
+    OCR_PAGE_TIMEOUT_S: int = 60
+    OCR_MIN_TEXT_CHARS: int = 20
+
     # load from .env if present
     model_config = SettingsConfigDict(env_file=".env", env_prefix="")
 
@@ -1,43 +1,169 @@
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
+from .config import settings
 
-# Create engine
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+
+
+def _engine_kwargs(url: str) -> dict:
+    kwargs = {"echo": settings.DB_ECHO}
+    if url.startswith("sqlite"):
+        if "aiosqlite" not in url:
+            kwargs["connect_args"] = {"check_same_thread": False}
+        return kwargs
+    kwargs.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+    return kwargs
+
+
+def async_database_url(url: str) -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    for prefix in ("postgresql://", "postgresql+psycopg2://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+def sqlite_production_enabled(url: str = SQLALCHEMY_DATABASE_URL) -> bool:
+    return settings.SQLITE_PROFILE == "production" and url.startswith("sqlite")
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while ingestion writes; NORMAL is durable enough under WAL
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.close()
+
+
+def _configure_engine(sync_engine, url: str):
+    if sqlite_production_enabled(url):
+        event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+
+
+# Create engine (sync: scripts, background extraction jobs)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_kwargs(SQLALCHEMY_DATABASE_URL))
+_configure_engine(engine, SQLALCHEMY_DATABASE_URL)
 
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for request handlers, created on first use so scripts and jobs that
+# only use SessionLocal don't open it. The app itself always imports the async
+# extension (it needs greenlet, pulled in by sqlalchemy[asyncio]).
+_async_engine = None
+_async_sessionmaker = None
+
+
+def get_async_engine():
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = async_database_url(SQLALCHEMY_DATABASE_URL)
+        _async_engine = create_async_engine(url, **_engine_kwargs(url))
+        _configure_engine(_async_engine.sync_engine, url)
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    get_async_engine()
+    return _async_sessionmaker()
+
+
+async def dispose_async_engine():
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
+
 # Base class for models
 Base = declarative_base()
 
 # -----------------------------------------
 # SAFE TABLE INSPECTION (won't crash)
+# Runs from the app lifespan / init_db, never at import
 # -----------------------------------------
-inspector = inspect(engine)
+def migrate_schema():
+    inspector = inspect(engine)
+
+    def _add_column_if_missing(table: str, column: str, ddl: str) -> bool:
+        if column in [col["name"] for col in inspector.get_columns(table)]:
+            return False
+        with engine.connect() as conn:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            conn.commit()
+        return True
+
+    try:
+        existing_tables = inspector.get_table_names()
+        if "pets" in existing_tables:
+            columns = [col["name"] for col in inspector.get_columns("pets")]
+            print("Existing columns:", columns)
+
+            # Add `img` column if missing
+            if "img" not in columns:
+                with engine.connect() as conn:
+                    conn.execute(text("ALTER TABLE pets ADD COLUMN img TEXT"))
+                    conn.commit()
+                    print("Added 'img' column successfully!")
 
-try:
-    existing_tables = inspector.get_table_names()
-    if "pets" in existing_tables:
-        columns = [col["name"] for col in inspector.get_columns("pets")]
-        print("Existing columns:", columns)
+        else:
+            print("Table 'pets' does not exist yet — will be created on startup.")
 
-        # Add `img` column if missing
-        if "img" not in columns:
+        # create_all only indexes new tables, so add the labs keyset index to existing DBs
+        if "labs" in existing_tables:
             with engine.connect() as conn:
-                conn.execute(text("ALTER TABLE pets ADD COLUMN img TEXT"))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_labs_pet_visit_date ON labs (pet_id, visit_date, id)"
+                ))
                 conn.commit()
-                print("Added 'img' column successfully!")
 
-    else:
-        print("Table 'pets' does not exist yet — will be created on startup.")
+        # Visit notes weren't persisted before; older labs keep NULL
+        if "labs" in existing_tables:
+            _add_column_if_missing("labs", "notes", "TEXT")
 
-except Exception as e:
-    print("Could not inspect tables:", e)
+        # Numeric value column; existing rows are filled by `python -m backend.backfill_lab_values`
+        if "lab_tests" in existing_tables:
+            if _add_column_if_missing("lab_tests", "value_num", "FLOAT"):
+                print("Added 'value_num' column; run backend.backfill_lab_values to populate it")
+            with engine.connect() as conn:
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_lab_tests_lab_test_name ON lab_tests (lab_id, test_name)"
+                ))
+                conn.commit()
+
+        # Version counters behind ETags
+        if "users" in existing_tables:
+            _add_column_if_missing("users", "version", "INTEGER NOT NULL DEFAULT 0")
+        if "pets" in existing_tables:
+            _add_column_if_missing("pets", "version", "INTEGER NOT NULL DEFAULT 0")
+            _add_column_if_missing("pets", "labs_version", "INTEGER NOT NULL DEFAULT 0")
+
+        # Image derivatives and the documents index; earlier data needs a one-off backfill
+        if "pets" in existing_tables:
+            if _add_column_if_missing("pets", "img_variants", "TEXT"):
+                print("Added 'img_variants' column; run backend.images --backfill to render thumbnails")
+            if "documents" not in existing_tables:
+                print("Creating the documents index; run backend.backfill_documents to include earlier uploads")
+
+    except Exception as e:
+        print("Could not inspect tables:", e)
 
 # Dependency for FastAPI
 def get_db():
@@ -46,3 +172,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
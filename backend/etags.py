@@ -0,0 +1,34 @@
+# backend/etags.py
+import hashlib
+
+from fastapi import Request, Response
+
+# Per-user data: clients may store it but must revalidate every time
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag derived from version counters and anything else that shapes the response."""
+    digest = hashlib.sha1(":".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate == etag or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def check_etag(request: Request, response: Response, etag: str, cache_control: str = PRIVATE_REVALIDATE):
+    """
+    Set ETag/Cache-Control on `response`. If the client already holds this version,
+    return a bare 304 for the endpoint to return before it builds the body; otherwise None.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
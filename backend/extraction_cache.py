@@ -0,0 +1,165 @@
+# backend/extraction_cache.py
+import hashlib
+import json
+import re
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from .config import settings
+from .database import SessionLocal
+from .models import ExtractionCache
+from .write_queue import run_write
+
+KINDS = ("pdf", "markdown")
+
+_stats = {kind: {"hits": 0, "misses": 0, "stores": 0, "evictions": 0} for kind in KINDS}
+_stats_lock = threading.Lock()
+
+# Hits recorded in memory and written with the next store, so lookups never write.
+# last_used_at only drives LRU eviction, which runs in that same store.
+_touched = {kind: {} for kind in KINDS}
+_touched_lock = threading.Lock()
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def normalize_markdown(text: str) -> str:
+    """Collapse whitespace so cosmetic differences in conversion don't defeat the cache."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def hash_markdown(text: str) -> str:
+    return hash_bytes(normalize_markdown(text).encode("utf-8"))
+
+
+def _count(kind: str, field: str, n: int = 1):
+    with _stats_lock:
+        _stats[kind][field] += n
+
+
+def _max_age() -> timedelta:
+    return timedelta(days=settings.EXTRACTION_CACHE_MAX_AGE_DAYS)
+
+
+def get(kind: str, key: str) -> dict | None:
+    """Return the cached extraction for (kind, key), or None on a miss or expired entry."""
+    if not settings.EXTRACTION_CACHE_ENABLED:
+        return None
+    with SessionLocal() as db:
+        entry = (
+            db.query(ExtractionCache.payload, ExtractionCache.created_at)
+            .filter_by(kind=kind, key=key)
+            .first()
+        )
+    now = datetime.utcnow()
+    if entry is None or entry.created_at < now - _max_age():
+        _count(kind, "misses")
+        return None
+    with _touched_lock:
+        _touched[kind][key] = now
+    _count(kind, "hits")
+    return json.loads(entry.payload)
+
+
+def _upsert(db, values: dict):
+    # One statement on the unique (kind, key) so concurrent stores of the same key both succeed
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(ExtractionCache).values(**values)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["kind", "key"],
+            set_={name: stmt.excluded[name] for name in ("payload", "size", "created_at", "last_used_at")},
+        ))
+        return
+    try:
+        with db.begin_nested():
+            db.add(ExtractionCache(**values))
+    except IntegrityError:
+        db.execute(
+            update(ExtractionCache)
+            .where(ExtractionCache.kind == values["kind"], ExtractionCache.key == values["key"])
+            .values(**values)
+        )
+
+
+def _flush_touches(db, kind: str):
+    with _touched_lock:
+        touched, _touched[kind] = _touched[kind], {}
+    for key, used_at in touched.items():
+        db.execute(
+            update(ExtractionCache)
+            .where(ExtractionCache.kind == kind, ExtractionCache.key == key, ExtractionCache.last_used_at < used_at)
+            .values(last_used_at=used_at)
+        )
+
+
+def put(kind: str, key: str, data: dict):
+    if not settings.EXTRACTION_CACHE_ENABLED:
+        return
+    payload = json.dumps(data)
+
+    def _store(db):
+        now = datetime.utcnow()
+        _upsert(db, {
+            "kind": kind,
+            "key": key,
+            "payload": payload,
+            "size": len(payload),
+            "created_at": now,
+            "last_used_at": now,
+        })
+        _flush_touches(db, kind)
+        return _evict(db, kind)
+
+    removed = run_write(_store)
+    _count(kind, "stores")
+    if removed:
+        _count(kind, "evictions", removed)
+
+
+def _evict(db, kind: str) -> int:
+    # Drop expired entries, then the least recently used ones above the size cap
+    removed = (
+        db.query(ExtractionCache)
+        .filter(ExtractionCache.kind == kind, ExtractionCache.created_at < datetime.utcnow() - _max_age())
+        .delete(synchronize_session=False)
+    )
+    over = db.query(ExtractionCache).filter_by(kind=kind).count() - settings.EXTRACTION_CACHE_MAX_ENTRIES
+    if over > 0:
+        stale_ids = [
+            row.id
+            for row in db.query(ExtractionCache.id)
+            .filter_by(kind=kind)
+            .order_by(ExtractionCache.last_used_at.asc())
+            .limit(over)
+        ]
+        removed += (
+            db.query(ExtractionCache)
+            .filter(ExtractionCache.id.in_(stale_ids))
+            .delete(synchronize_session=False)
+        )
+    return removed
+
+
+def stats() -> dict:
+    with _stats_lock:
+        out = {}
+        for kind, counts in _stats.items():
+            lookups = counts["hits"] + counts["misses"]
+            out[kind] = {**counts, "hit_rate": round(counts["hits"] / lookups, 4) if lookups else None}
+        return out
@@ -0,0 +1,271 @@
+# backend/images.py
+"""
+Pet photo derivatives. Uploads are stored as-is, then resized off the request path
+into a square thumbnail and a bounded medium image under content-hashed names, so
+they can be served with immutable cache headers. Files no longer referenced by any
+pet are removed once a replacement has been processed.
+Run `python -m backend.images --backfill --sweep` to render derivatives for existing
+pets and delete orphaned files.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import settings
+
+# Pillow is imported inside render_derivatives so importing the app doesn't pay for it
+
+UPLOAD_DIR = "uploads/pets"
+DERIVED_DIR = os.path.join(UPLOAD_DIR, "derived")
+SIZE_NAMES = ("thumb", "medium")
+# Accepted upload formats (Pillow format name) and the extension each is stored under
+UPLOAD_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif"}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _sizes() -> dict:
+    # size -> (max edge in px, crop to a square)
+    return {
+        "thumb": (settings.PET_IMAGE_THUMB_PX, True),
+        "medium": (settings.PET_IMAGE_MEDIUM_PX, False),
+    }
+
+
+def media_url(path: str) -> str:
+    rel = os.path.relpath(path, UPLOAD_DIR).replace(os.sep, "/")
+    return f"{settings.MEDIA_URL}/pets/{rel}"
+
+
+def image_urls(original: str | None, variants_json: str | None) -> dict | None:
+    """URLs per size; until the derivatives exist every size points at the original."""
+    if not original:
+        return None
+    variants = json.loads(variants_json) if variants_json else {}
+    original_url = media_url(original)
+    urls = {
+        size: media_url(os.path.join(DERIVED_DIR, variants[size])) if size in variants else original_url
+        for size in SIZE_NAMES
+    }
+    urls["original"] = original_url
+    return urls
+
+
+def detect_image_ext(path: str) -> str | None:
+    """
+    Decode the header of the file at `path` and return the extension for its format,
+    or None when it isn't one of UPLOAD_FORMATS. The stored name must come from this,
+    never from the client's filename, since uploads are served from a public static mount.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            fmt = img.format
+            img.verify()
+    except Exception:
+        return None
+    return UPLOAD_FORMATS.get(fmt)
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def render_derivatives(original_path: str) -> dict[str, str]:
+    """Write each derivative of `original_path`; returns {size: file name in DERIVED_DIR}."""
+    from PIL import Image, ImageOps, features
+
+    fmt = settings.PET_IMAGE_FORMAT.lower()
+    if fmt == "webp" and not features.check("webp"):
+        fmt = "jpeg"
+    ext, save_options = ("webp", {"method": 4}) if fmt == "webp" else ("jpg", {"optimize": True, "progressive": True})
+
+    os.makedirs(DERIVED_DIR, exist_ok=True)
+    names = {}
+    with Image.open(original_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto white rather than letting convert() turn it black
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, "white")
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        else:
+            img = img.convert("RGB")
+
+        for size, (px, square) in _sizes().items():
+            if square:
+                derived = ImageOps.fit(img, (px, px), Image.LANCZOS)
+            else:
+                derived = img.copy()
+                derived.thumbnail((px, px), Image.LANCZOS)
+            buf = io.BytesIO()
+            derived.save(buf, format=fmt.upper(), quality=settings.PET_IMAGE_QUALITY, **save_options)
+            data = buf.getvalue()
+            name = f"{size}-{hashlib.sha256(data).hexdigest()[:20]}.{ext}"
+            path = os.path.join(DERIVED_DIR, name)
+            if not os.path.exists(path):
+                _write_atomic(path, data)
+            else:
+                # Shared with another pet: refresh the mtime so GC's age guard covers this reuse too
+                os.utime(path)
+            names[size] = name
+    return names
+
+
+def _owned_path(path: str) -> bool:
+    # Only ever delete inside the upload folder, whatever a legacy Pet.img says
+    root = os.path.abspath(UPLOAD_DIR)
+    return os.path.commonpath([root, os.path.abspath(path)]) == root
+
+
+def _file_candidates(original: str | None, variants_json: str | None) -> list[str]:
+    paths = [original] if original else []
+    if variants_json:
+        paths += [os.path.join(DERIVED_DIR, name) for name in json.loads(variants_json).values()]
+    return paths
+
+
+def remove_unreferenced(paths: list[str], min_age_s: int | None = None) -> int:
+    """
+    Delete the given image files unless some pet still points at them. Files are shared
+    by content hash and land on disk before the uploading request commits, so a file
+    younger than `min_age_s` may be about to gain a reference and is left for the sweep.
+    """
+    from .database import SessionLocal
+    from .models import Pet
+
+    min_age_s = settings.IMAGE_GC_MIN_AGE_S if min_age_s is None else min_age_s
+    cutoff = time.time() - min_age_s
+    removed = 0
+    with SessionLocal() as db:
+        for path in paths:
+            if not path or not _owned_path(path) or not os.path.exists(path):
+                continue
+            if os.path.getmtime(path) > cutoff:
+                continue
+            if path.startswith(DERIVED_DIR):
+                name = os.path.basename(path)
+                in_use = db.query(Pet.id).filter(Pet.img_variants.contains(name)).first()
+            else:
+                in_use = db.query(Pet.id).filter(Pet.img == path).first()
+            if in_use is None:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def process_pet_image(pet_id: int, original_path: str, previous_img: str | None = None, previous_variants: str | None = None):
+    """
+    Render derivatives for a freshly uploaded image and attach them to the pet, unless
+    the pet was deleted or got another image in the meantime. Then collect the files
+    the upload replaced.
+    """
+    from sqlalchemy import update
+
+    from .models import Pet, User
+    from .write_queue import run_write
+
+    started = time.time()
+    try:
+        variants = render_derivatives(original_path)
+    except Exception as e:
+        print(f"Resizing image for pet {pet_id} failed: {e}")
+        variants = None
+
+    def _attach(db) -> bool:
+        pet = db.get(Pet, pet_id)
+        if pet is None or pet.img != original_path:
+            return False
+        if variants is not None:
+            pet.img_variants = json.dumps(variants)
+            pet.version += 1
+            # The owner's pet list embeds these URLs too
+            db.execute(update(User).where(User.id == pet.owner_id).values(version=User.version + 1))
+        return True
+
+    attached = run_write(_attach)
+    garbage = _file_candidates(previous_img, previous_variants)
+    if not attached and variants:
+        garbage += [os.path.join(DERIVED_DIR, name) for name in variants.values()]
+    removed = remove_unreferenced(garbage)
+    print(f"Image derivatives for pet {pet_id} took {time.time() - started:.2f}s ({removed} old file(s) removed)")
+
+
+def _submit(fn, *args):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix="images")
+        return _executor.submit(_logged, fn, *args)
+
+
+def _logged(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        print(f"Background image task {fn.__name__} failed: {e}")
+
+
+def schedule_processing(pet_id: int, original_path: str, previous_img: str | None = None, previous_variants: str | None = None):
+    return _submit(process_pet_image, pet_id, original_path, previous_img, previous_variants)
+
+
+def schedule_removal(img: str | None, variants_json: str | None):
+    """Collect a deleted pet's files off the request path."""
+    return _submit(remove_unreferenced, _file_candidates(img, variants_json))
+
+
+def shutdown_images():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def backfill() -> int:
+    """Render derivatives for pets that have an image but none yet."""
+    from .database import SessionLocal
+    from .models import Pet
+
+    with SessionLocal() as db:
+        pending = db.query(Pet.id, Pet.img).filter(Pet.img.isnot(None), Pet.img_variants.is_(None)).all()
+    for pet_id, img in pending:
+        if os.path.exists(img):
+            process_pet_image(pet_id, img)
+    return len(pending)
+
+
+def sweep_orphans(min_age_s: int = 3600) -> int:
+    """Delete files in the upload folders no pet references (skipping recent, possibly in-flight ones)."""
+    cutoff = time.time() - min_age_s
+    candidates = []
+    for folder in (UPLOAD_DIR, DERIVED_DIR):
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                candidates.append(path)
+    return remove_unreferenced(candidates, min_age_s)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pet image derivatives maintenance")
+    parser.add_argument("--backfill", action="store_true", help="render derivatives for pets without them")
+    parser.add_argument("--sweep", action="store_true", help="delete unreferenced image files")
+    args = parser.parse_args()
+    if args.backfill:
+        print(f"Processed {backfill()} pet image(s)")
+    if args.sweep:
+        print(f"Removed {sweep_orphans()} orphaned file(s)")
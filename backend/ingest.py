@@ -0,0 +1,184 @@
+# backend/ingest.py
+import hashlib
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .lab_summary import apply_new_tests
+from .lab_values import parse_numeric_value
+from .models import Document, Lab, LabTest, Pet
+
+
+def _parse_visit_date(value):
+    if value in ("unknown", None, ""):
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        print(f"Unparseable visit_date {value!r}, storing as unknown")
+        return None
+
+
+def _notes(visit: dict) -> str | None:
+    notes = visit.get("notes")
+    if isinstance(notes, list):
+        notes = ", ".join(str(n) for n in notes if n)
+    notes = str(notes).strip() if notes is not None else ""
+    return notes or None
+
+
+def _lab_hash(records: list) -> str:
+    lab_json_str = str(sorted(records, key=lambda x: x.get("test_name") or ""))
+    return hashlib.md5(lab_json_str.encode()).hexdigest()
+
+
+def _insert_ignoring_duplicates(db: Session, model=Lab, index_elements=("pet_id", "visit_date"), constraint="uix_pet_visit"):
+    # Upsert on the unique constraint so a concurrent ingest of the same row is skipped, not an error
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing(index_elements=list(index_elements))
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing(constraint=constraint)
+    return insert(model)
+
+
+def ingest_labs(db: Session, extracted_json: dict, petId: int, source_path: str | None = None) -> dict:
+    """
+    Insert the visits of a parsed extraction for one pet in a single transaction.
+    Returns counts of labs/tests inserted and visits skipped.
+    """
+    try:
+        report = stage_labs(db, extracted_json, petId, source_path)
+        db.commit()
+        return report
+    except Exception:
+        db.rollback()
+        raise
+
+
+def stage_labs(db: Session, extracted_json: dict, petId: int, source_path: str | None = None) -> dict:
+    """
+    Stage the inserts for ingest_labs without committing, so callers (e.g. the
+    write queue) can batch several ingests into one transaction.
+    Existing visits are resolved with one query; labs and tests go in as bulk inserts.
+    Visits with a known date are unique per pet; undated visits are deduped by lab_hash.
+    """
+    # Normalize and dedupe visits within the payload itself
+    candidates = {}
+    for visit in extracted_json.get("visits", []) or []:
+        if not visit:
+            continue
+        records = [r for r in visit.get("records", []) or [] if r and r.get("test_name")]
+        visit_date = _parse_visit_date(visit.get("visit_date"))
+        lab_hash = _lab_hash(records)
+        key = (visit_date, lab_hash if visit_date is None else None)
+        if key in candidates:
+            continue
+        candidates[key] = {"visit_date": visit_date, "lab_hash": lab_hash, "visit": visit, "records": records}
+
+    report = {"labs_inserted": 0, "labs_skipped": 0, "tests_inserted": 0}
+    total = len(candidates)
+    if not candidates:
+        return report
+
+    # Lock the pet row for the rest of the transaction so concurrent ingests for one pet
+    # take turns: the dedupe check below and the summary read-modify-write in
+    # apply_new_tests assume nobody else is writing this pet's labs. (No-op on SQLite,
+    # whose write lock already serializes writers.)
+    db.execute(select(Pet.id).where(Pet.id == petId).with_for_update())
+
+    dates = [c["visit_date"] for c in candidates.values() if c["visit_date"] is not None]
+    existing = db.execute(
+        select(Lab.visit_date, Lab.lab_hash).where(
+            Lab.pet_id == petId,
+            or_(Lab.visit_date.in_(dates), Lab.visit_date.is_(None)),
+        )
+    ).all()
+    seen_dates = {row.visit_date for row in existing if row.visit_date is not None}
+    seen_undated = {row.lab_hash for row in existing if row.visit_date is None}
+
+    new_labs = [
+        c for c in candidates.values()
+        if not (c["visit_date"] in seen_dates if c["visit_date"] is not None else c["lab_hash"] in seen_undated)
+    ]
+    if not new_labs:
+        report["labs_skipped"] = total
+        return report
+
+    now = datetime.now(timezone.utc)
+    rows = db.execute(
+        _insert_ignoring_duplicates(db).returning(Lab.id, Lab.visit_date, Lab.lab_hash),
+        [
+            {
+                "pet_id": petId,
+                "visit_date": c["visit_date"],
+                "created_at": now,
+                "lab_hash": c["lab_hash"],
+                "pdf_path": source_path,
+                "notes": _notes(c["visit"]),
+            }
+            for c in new_labs
+        ],
+    ).all()
+
+    lab_ids = {}
+    for row in rows:
+        lab_ids[(row.visit_date, row.lab_hash if row.visit_date is None else None)] = row.id
+
+    test_rows = []
+    summary_entries = []
+    for key, c in candidates.items():
+        lab_id = lab_ids.get(key)
+        if lab_id is None:
+            continue
+        for record in c["records"]:
+            row = {
+                "lab_id": lab_id,
+                "test_name": record.get("test_name"),
+                "value": str(record.get("value")) if record.get("value") is not None else "",
+                "value_num": parse_numeric_value(record.get("value")),
+                "unit": record.get("unit"),
+                "reference_range": record.get("reference_range"),
+            }
+            test_rows.append(row)
+            summary_entries.append({**row, "visit_date": c["visit_date"]})
+    if test_rows:
+        db.execute(insert(LabTest), test_rows)
+        apply_new_tests(db, petId, summary_entries)
+    if lab_ids:
+        db.execute(update(Pet).where(Pet.id == petId).values(labs_version=Pet.labs_version + 1))
+    # Sessions don't autoflush; make summary rows visible to the next staged ingest
+    db.flush()
+
+    report["labs_inserted"] = len(lab_ids)
+    report["labs_skipped"] = total - len(lab_ids)
+    report["tests_inserted"] = len(test_rows)
+    return report
+
+
+def stage_document(db: Session, extracted_json: dict, petId: int, filename: str, size: int,
+                   content_hash: str, json_path: str | None = None, report: dict | None = None,
+                   created_at: datetime | None = None):
+    """
+    Record an ingested upload in the documents index (same transaction as its labs).
+    A re-upload of the same bytes for the same pet keeps the original entry.
+    """
+    visits = extracted_json.get("visits") or []
+    extraction = extracted_json.get("extraction") or {}
+    db.execute(
+        _insert_ignoring_duplicates(db, Document, ("pet_id", "content_hash"), "uix_document_pet_hash").values(
+            owner_id=select(Pet.owner_id).where(Pet.id == petId).scalar_subquery(),
+            pet_id=petId,
+            filename=filename,
+            size=size,
+            content_hash=content_hash,
+            json_path=json_path,
+            extraction_path="cache" if extraction.get("cached") else extraction.get("path"),
+            visit_count=len(visits),
+            test_count=sum(len((v or {}).get("records") or []) for v in visits),
+            labs_inserted=(report or {}).get("labs_inserted", 0),
+            created_at=created_at or datetime.now(timezone.utc),
+        )
+    )
@@ -1,8 +1,17 @@
 # backend/init_db.py
-from backend.database import Base, engine
+from backend.database import Base, engine, migrate_schema
 from backend import models  # Make sure this imports your User and Pet models
+from backend.search import ensure_search_index
 
-# This will create all tables that don't exist yet
-Base.metadata.create_all(bind=engine)
 
-print("Database tables created!")
+def init_schema():
+    # Patch existing tables first, then create any that don't exist yet
+    migrate_schema()
+    Base.metadata.create_all(bind=engine)
+    # FTS5 index and triggers live outside the ORM metadata
+    ensure_search_index(engine)
+
+
+if __name__ == "__main__":
+    init_schema()
+    print("Database tables created!")
@@ -0,0 +1,145 @@
+# backend/jobs.py
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import settings
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind: str, meta: dict | None = None, owner_id: int | None = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.meta = meta or {}
+        # submitting user; only they can read the job back
+        self.owner_id = owner_id
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.future = None
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        queued_s = None
+        run_s = None
+        if self.started_at is not None:
+            queued_s = round(self.started_at - self.submitted_at, 3)
+            if self.finished_at is not None:
+                run_s = round(self.finished_at - self.started_at, 3)
+        out = {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "meta": self.meta,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "timings": {"queued_s": queued_s, "run_s": run_s},
+            "error": self.error,
+        }
+        if include_result:
+            out["result"] = self.result
+        return out
+
+
+class LocalJobBackend:
+    """
+    Runs jobs on a bounded in-process thread pool and keeps their state in memory.
+    Finished jobs are retained up to `max_retained` entries, oldest evicted first.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, max_retained: int):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._max_pending = max_pending
+        self._max_retained = max_retained
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn, *args, meta: dict | None = None, owner_id: int | None = None, **kwargs) -> Job:
+        job = Job(kind, meta, owner_id)
+        with self._lock:
+            if self._pending >= self._max_pending:
+                raise JobQueueFull(f"Job queue is full ({self._max_pending} pending)")
+            self._pending += 1
+            self._jobs[job.id] = job
+            self._evict_locked()
+        job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn, args, kwargs):
+        job.started_at = time.time()
+        job.status = "running"
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = "done"
+            return job.result
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            raise
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+
+    def _evict_locked(self):
+        if len(self._jobs) <= self._max_retained:
+            return
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self._max_retained:
+                break
+            if self._jobs[job_id].status in ("done", "failed"):
+                del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    async def wait(self, job: Job):
+        return await asyncio.wrap_future(job.future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_status = {}
+            for job in self._jobs.values():
+                by_status[job.status] = by_status.get(job.status, 0) + 1
+            return {"pending": self._pending, "retained": len(self._jobs), "by_status": by_status}
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_job_backend() -> LocalJobBackend:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if settings.JOB_BACKEND != "local":
+                raise RuntimeError(f"Unsupported JOB_BACKEND: {settings.JOB_BACKEND}")
+            _backend = LocalJobBackend(
+                max_workers=settings.JOB_WORKERS,
+                max_pending=settings.JOB_MAX_PENDING,
+                max_retained=settings.JOB_RETAIN,
+            )
+        return _backend
+
+
+def shutdown_job_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            _backend.shutdown()
+            _backend = None
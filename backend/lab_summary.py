@@ -0,0 +1,145 @@
+# backend/lab_summary.py
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .lab_values import is_abnormal
+from .models import Lab, LabSummary, LabTest
+
+
+def _is_newer(visit_date, lab_id, summary: LabSummary) -> bool:
+    # Dated visits beat undated ones; among equals the later-inserted lab wins
+    if summary.latest_lab_id is None:
+        return True
+    if visit_date is None or summary.latest_date is None:
+        if visit_date is None and summary.latest_date is not None:
+            return False
+        if visit_date is not None and summary.latest_date is None:
+            return True
+        return lab_id > summary.latest_lab_id
+    return (visit_date, lab_id) > (summary.latest_date, summary.latest_lab_id)
+
+
+def _set_latest(summary: LabSummary, entry: dict):
+    summary.latest_lab_id = entry["lab_id"]
+    summary.latest_date = entry["visit_date"]
+    summary.latest_value = entry["value"]
+    summary.latest_value_num = entry["value_num"]
+    if entry.get("unit"):
+        summary.unit = entry["unit"]
+    if entry.get("reference_range"):
+        summary.reference_range = entry["reference_range"]
+    summary.abnormal = is_abnormal(summary.latest_value_num, summary.reference_range)
+
+
+def apply_new_tests(db: Session, pet_id: int, entries: list[dict]):
+    """
+    Fold freshly inserted tests into the pet's summary rows without rescanning history.
+    Each entry needs lab_id, visit_date, test_name, value, value_num, unit, reference_range.
+    Runs inside the caller's transaction, which must hold the pet's row lock (stage_labs
+    takes it) so concurrent ingests can't interleave these read-modify-writes.
+    """
+    if not entries:
+        return
+    names = {e["test_name"] for e in entries}
+    summaries = {
+        s.test_name: s
+        for s in db.query(LabSummary).filter(LabSummary.pet_id == pet_id, LabSummary.test_name.in_(names))
+    }
+    now = datetime.utcnow()
+    for entry in entries:
+        summary = summaries.get(entry["test_name"])
+        if summary is None:
+            summary = LabSummary(pet_id=pet_id, test_name=entry["test_name"], count=0, numeric_count=0)
+            db.add(summary)
+            summaries[entry["test_name"]] = summary
+
+        summary.count += 1
+        value_num = entry["value_num"]
+        if value_num is not None:
+            summary.numeric_count += 1
+            summary.sum_value = (summary.sum_value or 0.0) + value_num
+            summary.min_value = value_num if summary.min_value is None else min(summary.min_value, value_num)
+            summary.max_value = value_num if summary.max_value is None else max(summary.max_value, value_num)
+        if _is_newer(entry["visit_date"], entry["lab_id"], summary):
+            _set_latest(summary, entry)
+        summary.updated_at = now
+
+
+def rebuild_pet(db: Session, pet_id: int):
+    """Recompute a pet's summary rows from lab_tests; used after deletes and for backfills."""
+    db.query(LabSummary).filter(LabSummary.pet_id == pet_id).delete(synchronize_session=False)
+
+    aggregates = (
+        db.query(
+            LabTest.test_name,
+            func.count(LabTest.id),
+            func.count(LabTest.value_num),
+            func.min(LabTest.value_num),
+            func.max(LabTest.value_num),
+            func.sum(LabTest.value_num),
+        )
+        .join(Lab, Lab.id == LabTest.lab_id)
+        .filter(Lab.pet_id == pet_id)
+        .group_by(LabTest.test_name)
+        .all()
+    )
+    if not aggregates:
+        return
+
+    ranked = (
+        db.query(
+            LabTest.test_name.label("test_name"),
+            Lab.id.label("lab_id"),
+            Lab.visit_date.label("visit_date"),
+            LabTest.value.label("value"),
+            LabTest.value_num.label("value_num"),
+            LabTest.unit.label("unit"),
+            LabTest.reference_range.label("reference_range"),
+            func.row_number().over(
+                partition_by=LabTest.test_name,
+                order_by=(Lab.visit_date.is_(None), Lab.visit_date.desc(), Lab.id.desc(), LabTest.id.desc()),
+            ).label("rn"),
+        )
+        .join(Lab, Lab.id == LabTest.lab_id)
+        .filter(Lab.pet_id == pet_id)
+        .subquery()
+    )
+    latest = {row.test_name: row for row in db.query(ranked).filter(ranked.c.rn == 1)}
+
+    now = datetime.utcnow()
+    for test_name, count, numeric_count, min_value, max_value, sum_value in aggregates:
+        summary = LabSummary(
+            pet_id=pet_id,
+            test_name=test_name,
+            count=count,
+            numeric_count=numeric_count,
+            min_value=min_value,
+            max_value=max_value,
+            sum_value=sum_value,
+            updated_at=now,
+        )
+        row = latest.get(test_name)
+        if row is not None:
+            _set_latest(summary, row._asdict())
+        db.add(summary)
+
+
+def summary_dict(summary: LabSummary) -> dict:
+    return {
+        "test_name": summary.test_name,
+        "unit": summary.unit,
+        "reference_range": summary.reference_range,
+        "latest": {
+            "visit_date": summary.latest_date.isoformat() if summary.latest_date else "unknown",
+            "value": summary.latest_value,
+            "value_num": summary.latest_value_num,
+        },
+        "abnormal": summary.abnormal,
+        "count": summary.count,
+        "numeric_count": summary.numeric_count,
+        "min": summary.min_value,
+        "max": summary.max_value,
+        "mean": summary.sum_value / summary.numeric_count if summary.numeric_count else None,
+    }
@@ -0,0 +1,52 @@
+# backend/lab_values.py
+import re
+
+# Leading number of a lab value: "12.5", "<0.1", ">1,000", "5.6 H", "-3"
+_NUMBER_RE = re.compile(r"^\s*[<>≤≥~=]*\s*(-?\d[\d,]*(?:\.\d+)?|-?\.\d+)")
+
+
+def parse_numeric_value(value) -> float | None:
+    """Best-effort float for a lab value string; None for qualitative results like "Negative"."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER_RE.match(str(value))
+    if not match:
+        return None
+    try:
+        return float(match.group(1).replace(",", ""))
+    except ValueError:
+        return None
+
+
+# Reference ranges: "0.5-1.8", "0.5 – 1.8", "<5", "> 10", "up to 40"
+_RANGE_RE = re.compile(r"(-?\d[\d,]*(?:\.\d+)?)\s*(?:-|–|—|to)\s*(-?\d[\d,]*(?:\.\d+)?)")
+_UPPER_RE = re.compile(r"^\s*(?:<=?|≤|up to)\s*(-?\d[\d,]*(?:\.\d+)?)", re.IGNORECASE)
+_LOWER_RE = re.compile(r"^\s*(?:>=?|≥)\s*(-?\d[\d,]*(?:\.\d+)?)")
+
+
+def parse_reference_range(text) -> tuple[float | None, float | None] | None:
+    """Return (low, high) bounds of a reference range, either bound may be None; None if unparseable."""
+    if not text:
+        return None
+    text = str(text)
+    match = _RANGE_RE.search(text)
+    if match:
+        return float(match.group(1).replace(",", "")), float(match.group(2).replace(",", ""))
+    match = _UPPER_RE.match(text)
+    if match:
+        return None, float(match.group(1).replace(",", ""))
+    match = _LOWER_RE.match(text)
+    if match:
+        return float(match.group(1).replace(",", "")), None
+    return None
+
+
+def is_abnormal(value_num: float | None, reference_range) -> bool | None:
+    """True/False when the value can be compared to the range, None otherwise."""
+    bounds = parse_reference_range(reference_range)
+    if value_num is None or bounds is None:
+        return None
+    low, high = bounds
+    return (low is not None and value_num < low) or (high is not None and value_num > high)
@@ -0,0 +1,320 @@
+# backend/llm_client.py
+import hashlib
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+
+from dotenv import load_dotenv
+
+from . import metrics
+from .config import settings
+
+
+class LLMError(Exception):
+    pass
+
+
+class TransientLLMError(LLMError):
+    """Worth retrying: rate limits, timeouts, 5xx."""
+
+
+class LLMDeadlineExceeded(LLMError):
+    pass
+
+
+@dataclass
+class LLMResult:
+    text: str
+    latency_s: float = 0.0
+    attempts: int = 1
+    input_tokens: int | None = None
+    output_tokens: int | None = None
+
+
+class LLMBackend(ABC):
+    """One provider call. Implementations raise TransientLLMError for retryable failures."""
+
+    name = "base"
+
+    @abstractmethod
+    def generate(self, prompt: str, content: str, timeout_s: float) -> LLMResult:
+        ...
+
+
+# google.api_core exception class names that are safe to retry
+_TRANSIENT_GOOGLE_ERRORS = {
+    "ResourceExhausted",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "InternalServerError",
+    "TooManyRequests",
+    "GatewayTimeout",
+}
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_name: str):
+        # Import and configure on first construction; the SDK is slow to import
+        import google.generativeai as genai
+
+        # Load environment variables
+        load_dotenv(dotenv_path="backend/.env")
+        GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") or "dummy_key_for_local_testing"
+        genai.configure(api_key=GOOGLE_API_KEY)
+        self._model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt: str, content: str, timeout_s: float) -> LLMResult:
+        try:
+            response = self._model.generate_content(
+                [prompt, content],
+                request_options={"timeout": timeout_s},
+            )
+        except Exception as e:
+            if type(e).__name__ in _TRANSIENT_GOOGLE_ERRORS or isinstance(e, (TimeoutError, ConnectionError)):
+                raise TransientLLMError(str(e)) from e
+            raise
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResult(
+            text=response.text,
+            input_tokens=getattr(usage, "prompt_token_count", None),
+            output_tokens=getattr(usage, "candidates_token_count", None),
+        )
+
+
+class FakeBackend(LLMBackend):
+    """
+    Offline backend. `responder(prompt, content)` returns the response text; by default
+    an empty extraction. Can simulate latency and a number of transient failures.
+    """
+
+    name = "fake"
+
+    def __init__(self, responder=None, latency_s: float = 0.0, fail_first: int = 0):
+        self.responder = responder or (lambda prompt, content: '{"visits": []}')
+        self.latency_s = latency_s
+        self.fail_first = fail_first
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, content: str, timeout_s: float) -> LLMResult:
+        with self._lock:
+            self.calls.append((prompt, content))
+            fail = self.fail_first > 0
+            if fail:
+                self.fail_first -= 1
+        if self.latency_s:
+            time.sleep(min(self.latency_s, timeout_s))
+            if self.latency_s > timeout_s:
+                raise TransientLLMError("fake backend timed out")
+        if fail:
+            raise TransientLLMError("fake transient failure")
+        return LLMResult(text=self.responder(prompt, content))
+
+
+class TokenBucket:
+    def __init__(self, rate_per_s: float, burst: int):
+        self.rate = rate_per_s
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float) -> bool:
+        """Take one token, waiting until `deadline` (monotonic) at most."""
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+@dataclass
+class _Stats:
+    calls: int = 0
+    coalesced: int = 0
+    attempts: int = 0
+    retries: int = 0
+    failures: int = 0
+    latency_s_total: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class LLMClient:
+    """
+    Shared entry point for LLM calls: token-bucket rate limit, max in-flight cap,
+    jittered exponential retries on transient errors, a per-call deadline, and
+    coalescing of identical concurrent requests into one provider call.
+    """
+
+    def __init__(self, backend: LLMBackend, rate_per_s: float, burst: int, max_in_flight: int,
+                 max_retries: int, backoff_base_s: float, backoff_max_s: float, deadline_s: float):
+        self.backend = backend
+        self._bucket = TokenBucket(rate_per_s, burst)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._max_retries = max_retries
+        self._backoff_base_s = backoff_base_s
+        self._backoff_max_s = backoff_max_s
+        self._deadline_s = deadline_s
+        self._in_flight: dict[str, Future] = {}
+        self._in_flight_lock = threading.Lock()
+        self._stats = _Stats()
+
+    def generate(self, prompt: str, content: str = "", deadline_s: float | None = None) -> LLMResult:
+        deadline_s = deadline_s or self._deadline_s
+        key = hashlib.sha256(f"{self.backend.name}\0{prompt}\0{content}".encode("utf-8")).hexdigest()
+        with self._in_flight_lock:
+            leader = self._in_flight.get(key)
+            if leader is None:
+                future = Future()
+                self._in_flight[key] = future
+        if leader is not None:
+            with self._stats.lock:
+                self._stats.coalesced += 1
+            # A stuck leader must not hold a follower past the follower's own deadline
+            try:
+                return leader.result(timeout=deadline_s)
+            except FutureTimeoutError:
+                raise LLMDeadlineExceeded(f"LLM call exceeded its {deadline_s:.0f}s deadline waiting for an identical request")
+
+        try:
+            result = self._call(prompt, content, deadline_s)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.pop(key, None)
+
+    def _call(self, prompt: str, content: str, deadline_s: float) -> LLMResult:
+        started = time.monotonic()
+        deadline = started + deadline_s
+        attempt = 0
+        with self._stats.lock:
+            self._stats.calls += 1
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._bucket.acquire(deadline):
+                self._record_failure()
+                raise LLMDeadlineExceeded(f"LLM call exceeded its {deadline_s:.0f}s deadline")
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                self._record_failure()
+                raise LLMDeadlineExceeded(f"LLM call exceeded its {deadline_s:.0f}s deadline waiting for a slot")
+            try:
+                with self._stats.lock:
+                    self._stats.attempts += 1
+                result = self.backend.generate(prompt, content, max(0.1, deadline - time.monotonic()))
+            except TransientLLMError as e:
+                if attempt > self._max_retries:
+                    self._record_failure()
+                    raise
+                # Full jitter: sleep a random amount up to the exponential cap
+                backoff = random.uniform(0, min(self._backoff_max_s, self._backoff_base_s * 2 ** (attempt - 1)))
+                if time.monotonic() + backoff >= deadline:
+                    self._record_failure()
+                    raise LLMDeadlineExceeded(f"LLM call exceeded its deadline after {attempt} attempts: {e}") from e
+                with self._stats.lock:
+                    self._stats.retries += 1
+                print(f"Transient LLM error (attempt {attempt}), retrying in {backoff:.2f}s: {e}")
+                time.sleep(backoff)
+                continue
+            except Exception:
+                self._record_failure()
+                raise
+            finally:
+                self._slots.release()
+
+            result.latency_s = time.monotonic() - started
+            result.attempts = attempt
+            metrics.llm_latency.observe(result.latency_s, backend=self.backend.name)
+            with self._stats.lock:
+                self._stats.latency_s_total += result.latency_s
+                self._stats.input_tokens += result.input_tokens or 0
+                self._stats.output_tokens += result.output_tokens or 0
+            return result
+
+    def _record_failure(self):
+        with self._stats.lock:
+            self._stats.failures += 1
+
+    def stats(self) -> dict:
+        s = self._stats
+        with s.lock:
+            succeeded = s.calls - s.failures
+            return {
+                "backend": self.backend.name,
+                "calls": s.calls,
+                "coalesced": s.coalesced,
+                "attempts": s.attempts,
+                "retries": s.retries,
+                "failures": s.failures,
+                "avg_latency_s": round(s.latency_s_total / succeeded, 4) if succeeded > 0 else None,
+                "input_tokens": s.input_tokens,
+                "output_tokens": s.output_tokens,
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _default_backend() -> LLMBackend:
+    if settings.LLM_BACKEND == "fake":
+        return FakeBackend()
+    if settings.LLM_BACKEND == "gemini":
+        return GeminiBackend(settings.LLM_MODEL)
+    raise RuntimeError(f"Unsupported LLM_BACKEND: {settings.LLM_BACKEND}")
+
+
+def _build_client(backend: LLMBackend) -> LLMClient:
+    return LLMClient(
+        backend,
+        rate_per_s=settings.LLM_RATE_PER_S,
+        burst=settings.LLM_BURST,
+        max_in_flight=settings.LLM_MAX_IN_FLIGHT,
+        max_retries=settings.LLM_MAX_RETRIES,
+        backoff_base_s=settings.LLM_BACKOFF_BASE_S,
+        backoff_max_s=settings.LLM_BACKOFF_MAX_S,
+        deadline_s=settings.LLM_DEADLINE_S,
+    )
+
+
+def get_llm_client() -> LLMClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = _build_client(_default_backend())
+        return _client
+
+
+def client_stats() -> dict | None:
+    """Stats of the process-wide client, or None if nothing has used it yet."""
+    with _client_lock:
+        return _client.stats() if _client is not None else None
+
+
+def set_llm_backend(backend: LLMBackend) -> LLMClient:
+    """Swap the process-wide backend, e.g. a FakeBackend for offline runs."""
+    global _client
+    with _client_lock:
+        _client = _build_client(backend)
+        return _client
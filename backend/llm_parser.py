@@ -1,62 +1,263 @@
-import os
 import time
-import io
 import json
-import pytesseract
-import json_repair
-import google.generativeai as genai
-from datetime import datetime, timezone
-from dotenv import load_dotenv
-from PIL import Image
-import fitz  # PyMuPDF
-import pymupdf4llm
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy.orm import Session
-from .database import SessionLocal
-from .models import Lab, LabTest
-import hashlib
+from .ingest import ingest_labs, stage_document, stage_labs
+from .write_queue import run_write
+from . import artifacts, extraction_cache, metrics, ocr, table_parser
+from .config import settings
+from .llm_client import get_llm_client
+from .stages import record, stage
 
-# --- Ensure pytesseract points to Tesseract executable ---
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# pymupdf4llm and json_repair are slow to import, so they are loaded on first use
+# rather than when the app (or a test) imports this module
 
-# Load environment variables
-load_dotenv(dotenv_path="backend/.env")
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") or "dummy_key_for_local_testing"
-genai.configure(api_key=GOOGLE_API_KEY)
 
-
-def extract_data_from_pdf(file_path: str, petId: int, original_filename: str) -> dict:
+def extract_data_from_pdf(pdf: bytes | str, petId: int, original_filename: str, pdf_hash: str | None = None) -> dict:
     """
-    Extract lab data from PDF, save JSON in permanent folder, and insert labs into DB.
+    Extract lab data from a PDF (bytes, or a path that is read once), insert labs into
+    the DB and persist the JSON in the background. Nothing else touches the filesystem.
+    Re-uploads of the same bytes (or the same normalized markdown) are served from
+    the extraction cache without calling the LLM.
     Returns parsed JSON.
     """
-    # Convert PDF to markdown text
-    md_text = pymupdf4llm.to_markdown(file_path)
+    started = time.perf_counter()
+    try:
+        extracted_json = _extract_data_from_pdf(pdf, petId, original_filename, pdf_hash)
+    except Exception:
+        metrics.extractions.inc(path="unknown", outcome="error")
+        raise
+    _record_outcome(extracted_json, time.perf_counter() - started)
+    return extracted_json
+
+
+def _record_outcome(extracted_json: dict, elapsed_s: float):
+    extraction = extracted_json.get("extraction") or {}
+    path = "cache" if extraction.get("cached") else extraction.get("path", "unknown")
+    metrics.extractions.inc(path=path, outcome="ok")
+    metrics.extraction_latency.observe(elapsed_s, path=path)
+
+
+def _extract_data_from_pdf(pdf: bytes | str, petId: int, original_filename: str, pdf_hash: str | None) -> dict:
+    start_time = time.time()
+    if isinstance(pdf, str):
+        with open(pdf, "rb") as f:
+            pdf = f.read()
+    if pdf_hash is None:
+        pdf_hash = extraction_cache.hash_bytes(pdf)
+
+    extracted_json, pages, md_hash = convert_pdf(pdf, pdf_hash, original_filename)
+    if extracted_json is None:
+        extracted_json = extract_converted(pages, petId, pdf_hash, md_hash)
+
+    extracted_json["petId"] = petId
+    elapsed = time.time() - start_time
+    print(f"PDF extraction for {original_filename} took {elapsed:.2f}s")
+
+    json_path = artifacts.converted_json_path(petId, original_filename)
+
+    def _ingest(db):
+        report = stage_labs(db, extracted_json, petId, source_path=json_path)
+        stage_document(db, extracted_json, petId, original_filename, len(pdf), pdf_hash, json_path, report)
+        return report
+
+    with stage("db_insert"):
+        report = run_write(_ingest)
+    print(f"Lab ingest for pet {petId}: {report}")
+    artifacts.persist_json_async(json_path, extracted_json)
+
+    return extracted_json
+
+
+def convert_pdf(pdf: bytes, pdf_hash: str, original_filename: str) -> tuple[dict | None, list[str] | None, str | None]:
+    """
+    First half of an extraction: cache lookups, then PDF -> markdown pages.
+    Returns (extraction, None, None) when the cache answers, else (None, pages, markdown hash).
+    """
+    extracted_json = extraction_cache.get("pdf", pdf_hash)
+    if extracted_json is not None:
+        print(f"Extraction cache hit for {original_filename} ({pdf_hash[:12]})")
+        extracted_json.setdefault("extraction", {})["cached"] = True
+        return extracted_json, None, None
+
+    pages = pdf_to_pages(pdf)
+    md_hash = extraction_cache.hash_markdown("".join(pages))
+    extracted_json = extraction_cache.get("markdown", md_hash)
+    if extracted_json is not None:
+        print(f"Extraction cache hit for {original_filename} (markdown {md_hash[:12]})")
+        # Store the payload as it was cached, then flag the returned copy like a PDF-hash hit
+        extraction_cache.put("pdf", pdf_hash, extracted_json)
+        extracted_json = {**extracted_json, "extraction": {**extracted_json.get("extraction", {}), "cached": True}}
+        return extracted_json, None, md_hash
+    return None, pages, md_hash
+
+
+def extract_converted(pages: list[str], petId: int, pdf_hash: str, md_hash: str) -> dict:
+    """Second half: table parser or LLM over the converted pages, cached under both keys."""
+    extracted_json = extract_from_pages(pages, petId)
+    extraction_cache.put("markdown", md_hash, extracted_json)
+    extraction_cache.put("pdf", pdf_hash, extracted_json)
+    return extracted_json
+
+
+def _extract_converted_timed(pages: list[str], petId: int, pdf_hash: str, md_hash: str):
+    started = time.perf_counter()
+    with record() as timings:
+        extracted_json = extract_converted(pages, petId, pdf_hash, md_hash)
+    return extracted_json, dict(timings), time.perf_counter() - started
+
+
+def extract_batch_from_pdfs(files: list[tuple[bytes | str, str, str | None]], petId: int) -> dict:
+    """
+    Extract several PDFs, given as (bytes or path, original_filename, pdf_hash), for one pet.
+    Files are converted one after another while the table parser/LLM step of earlier
+    files runs on a small pool (BATCH_LLM_CONCURRENCY), so conversion/OCR of file N+1
+    overlaps the LLM call for file N. All labs go in with one transaction.
+    A file that fails to extract is reported and skipped; a failed insert fails the batch.
+    Returns a per-file report.
+    """
+    started = time.perf_counter()
+    entries, pending = [], []
+    with ThreadPoolExecutor(max_workers=settings.BATCH_LLM_CONCURRENCY, thread_name_prefix="batch-llm") as pool:
+        for pdf, original_filename, pdf_hash in files:
+            entry = {"filename": original_filename, "status": "ok", "error": None, "path": None}
+            entries.append(entry)
+            convert_started = time.perf_counter()
+            try:
+                with record() as convert_timings:
+                    if isinstance(pdf, str):
+                        with open(pdf, "rb") as f:
+                            pdf = f.read()
+                    pdf_hash = pdf_hash or extraction_cache.hash_bytes(pdf)
+                    size = len(pdf)
+                    extracted_json, pages, md_hash = convert_pdf(pdf, pdf_hash, original_filename)
+            except Exception as e:
+                print(f"Conversion of {original_filename} failed: {e}")
+                metrics.extractions.inc(path="unknown", outcome="error")
+                entry.update(status="failed", error=str(e))
+                continue
+            del pdf
+            convert_s = time.perf_counter() - convert_started
+            if extracted_json is None:
+                work = pool.submit(_extract_converted_timed, pages, petId, pdf_hash, md_hash)
+            else:
+                work = (extracted_json, {}, 0.0)
+            pending.append((entry, work, dict(convert_timings), convert_s, size, pdf_hash))
+
+        extracted = []
+        for entry, work, convert_timings, convert_s, size, pdf_hash in pending:
+            try:
+                extracted_json, extract_timings, extract_s = work if isinstance(work, tuple) else work.result()
+            except Exception as e:
+                print(f"Extraction of {entry['filename']} failed: {e}")
+                metrics.extractions.inc(path="unknown", outcome="error")
+                entry.update(status="failed", error=str(e))
+                continue
+            extracted_json["petId"] = petId
+            _record_outcome(extracted_json, convert_s + extract_s)
+            extraction = extracted_json.get("extraction") or {}
+            entry.update(
+                path="cache" if extraction.get("cached") else extraction.get("path"),
+                visits=len(extracted_json.get("visits") or []),
+                records=sum(len(v.get("records") or []) for v in extracted_json.get("visits") or []),
+                timings={
+                    "convert_s": round(convert_s, 3),
+                    "extract_s": round(extract_s, 3),
+                    "stages": {k: round(v, 3) for k, v in {**convert_timings, **extract_timings}.items()},
+                },
+                result=extracted_json,
+            )
+            json_path = artifacts.converted_json_path(petId, entry["filename"])
+            extracted.append((entry, extracted_json, json_path, size, pdf_hash))
+
+    db_started = time.perf_counter()
+    if extracted:
+        def _ingest_all(db):
+            reports = []
+            for entry, extracted_json, json_path, size, pdf_hash in extracted:
+                report = stage_labs(db, extracted_json, petId, source_path=json_path)
+                stage_document(db, extracted_json, petId, entry["filename"], size, pdf_hash, json_path, report)
+                reports.append(report)
+            return reports
+
+        with stage("db_insert"):
+            reports = run_write(_ingest_all)
+        for (entry, extracted_json, json_path, _, _), report in zip(extracted, reports):
+            entry["ingest"] = report
+            artifacts.persist_json_async(json_path, extracted_json)
+    db_s = time.perf_counter() - db_started
+
+    totals = {"files": len(entries), "succeeded": len(extracted), "failed": len(entries) - len(extracted)}
+    for key in ("labs_inserted", "labs_skipped", "tests_inserted"):
+        totals[key] = sum(entry.get("ingest", {}).get(key, 0) for entry in entries)
+    total_s = time.perf_counter() - started
+    print(f"Batch of {len(entries)} PDF(s) for pet {petId} took {total_s:.2f}s: {totals}")
+    return {
+        "petId": petId,
+        "files": entries,
+        "totals": totals,
+        "timings": {"total_s": round(total_s, 3), "db_s": round(db_s, 3)},
+    }
 
-    if any(not c.isspace() for c in md_text):
-        markdown_text = md_text
+
+def pdf_to_pages(pdf_bytes: bytes) -> list[str]:
+    """
+    Convert an in-memory PDF to one markdown string per page. Pages with a usable text
+    layer go through pymupdf4llm, pages without one are OCR'd in parallel.
+    """
+    import fitz  # PyMuPDF
+    import pymupdf4llm
+
+    pages_md = {}
+    with stage("to_markdown"), fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        text_pages, scanned_pages = ocr.pages_needing_ocr(doc)
+        if text_pages:
+            chunks = pymupdf4llm.to_markdown(doc, pages=text_pages, page_chunks=True)
+            for i, chunk in zip(text_pages, chunks):
+                pages_md[i] = chunk["text"]
+
+    if scanned_pages:
+        ocr_started = time.time()
+        with stage("ocr"):
+            ocr_text = ocr.ocr_pages(pdf_bytes, scanned_pages)
+        for i, text in ocr_text.items():
+            pages_md[i] = f"# Page {i+1}\n\n{text}\n\n---\n\n"
+        print(f"OCR of {len(scanned_pages)} page(s) took {time.time() - ocr_started:.2f}s")
+
+    return [pages_md[i] for i in sorted(pages_md)]
+
+
+def pdf_to_markdown(pdf_bytes: bytes) -> str:
+    return "".join(pdf_to_pages(pdf_bytes))
+
+
+def extract_from_pages(pages: list[str], petId: int) -> dict:
+    """
+    Try the rule-based table parser first and only call the LLM when it isn't
+    confident. The chosen path is recorded under "extraction" in the result.
+    """
+    if settings.TABLE_PARSER_ENABLED:
+        with stage("table_parse"):
+            parsed, confidence = table_parser.parse_report(pages, petId)
+        records = sum(len(v["records"]) for v in parsed["visits"])
+        if confidence >= settings.TABLE_PARSER_MIN_CONFIDENCE and records >= settings.TABLE_PARSER_MIN_RECORDS:
+            print(f"Table parser extracted {records} records (confidence {confidence})")
+            parsed["extraction"] = {"path": "table", "confidence": confidence}
+            return parsed
+        print(f"Table parser confidence {confidence} with {records} records, falling back to LLM")
     else:
-        # OCR fallback
-        pages_text = []
-        with fitz.open(file_path) as doc:
-            for i, page in enumerate(doc):
-                pix = page.get_pixmap(dpi=300)
-                img_bytes = pix.tobytes("png")
-                with Image.open(io.BytesIO(img_bytes)).convert("L") as img:
-                    text = pytesseract.image_to_string(img, config="--psm 3")
-                    pages_text.append(f"# Page {i+1}\n\n{text.strip()}\n\n---\n\n")
-        markdown_text = "".join(pages_text)
-
-    # Save markdown temporarily
-    tmp_path = "markdown.md"
-    with open(tmp_path, "w", encoding="utf-8") as f:
-        f.write(markdown_text)
-        f.flush()
-        os.fsync(f.fileno())
-
-    # --- Prompt Gemini ---
+        confidence = None
+
+    extracted = extract_with_llm(pages, petId)
+    extracted["extraction"] = {"path": "llm", "table_confidence": confidence}
+    return extracted
+
+
+def build_prompt(petId: int, header: str | None = None) -> str:
     prompt = f"""
 You are an expert medical data extraction assistant. 
-Analyze the attached PDF lab report accurately.
+Analyze the lab report below (converted from PDF to markdown) accurately.
 
 Extract all medical tests, values, units, and reference ranges.
 Group them by visit date.
@@ -86,102 +287,126 @@ Schema:
 
 If the visit date is not found, use "unknown".
 """
+    if header:
+        prompt += f"""
+The report below is one part of a longer document. The start of the first page is
+repeated here only so you can resolve the patient and visit dates; do not extract
+tests from it unless they also appear in the part below.
+
+--- REPORT HEADER ---
+{header}
+--- END HEADER ---
+"""
+    return prompt
 
-    start_time = time.time()
-    try:
-        # Upload markdown file to Gemini
-        uploaded_file = genai.upload_file(tmp_path, mime_type="text/markdown")
-        model = genai.GenerativeModel("models/gemini-2.5-flash-lite")
-        response = model.generate_content([prompt, uploaded_file])
-
-        # Cleanup Gemini uploaded file
-        file_id = getattr(uploaded_file, "name", None) or getattr(uploaded_file, "uri", None)
-        if file_id:
-            try:
-                genai.delete_file(file_id)
-            except:
-                pass
 
-        text = response.text.strip()
-        if text.startswith("```"):
-            text = text.strip("`").replace("json", "", 1).strip()
+def parse_llm_json(text: str) -> dict:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").replace("json", "", 1).strip()
 
+    with stage("json_parse"):
         try:
-            extracted_json = json.loads(text)
+            return json.loads(text)
         except json.JSONDecodeError:
-            repaired = json_repair.repair_json(text)
-            extracted_json = json.loads(repaired)
+            import json_repair
 
-    finally:
-        elapsed = time.time() - start_time
-        print(f"PDF extraction for {file_path} took {elapsed:.2f}s")
+            with stage("json_repair"):
+                repaired = json_repair.repair_json(text)
+            return json.loads(repaired)
 
-        # Save JSON to permanent folder
-        base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Files", "Converted_JSONs")
-        pet_folder = os.path.join(base_dir, str(petId))
-        os.makedirs(pet_folder, exist_ok=True)
 
-        json_filename = original_filename + ".json"
-        json_path = os.path.join(pet_folder, json_filename)
-        with open(json_path, "w", encoding="utf-8") as jf:
-            json.dump(extracted_json, jf, indent=2)
+def chunk_pages(pages: list[str], max_chars: int) -> list[str]:
+    """Group consecutive pages into chunks of at most `max_chars` (a single long page stays whole)."""
+    chunks, current, size = [], [], 0
+    for page in pages:
+        if current and size + len(page) > max_chars:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(page)
+        size += len(page)
+    if current:
+        chunks.append("".join(current))
+    return chunks
 
-        if os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except Exception as e:
-                print(f"Failed to delete temp markdown: {e}")
 
-        db = SessionLocal()
-        insert_extracted_labs_to_db(db, json_path, petId)
+def merge_extractions(parts: list[dict], petId: int) -> dict:
+    """
+    Merge per-chunk results deterministically: visits keyed by date (in chunk order,
+    then sorted with "unknown" last), records deduped by test name (first seen wins),
+    notes de-duplicated and joined.
+    """
+    visits = {}
+    for part in parts:
+        for visit in (part or {}).get("visits", []) or []:
+            if not visit:
+                continue
+            date = visit.get("visit_date") or "unknown"
+            merged = visits.setdefault(date, {"visit_date": date, "records": [], "notes": [], "_seen": set()})
+            for test in visit.get("records", []) or []:
+                name = (test or {}).get("test_name")
+                if not name or name.strip().lower() in merged["_seen"]:
+                    continue
+                merged["_seen"].add(name.strip().lower())
+                merged["records"].append(test)
+            note = (visit.get("notes") or "").strip()
+            if note and note not in merged["notes"]:
+                merged["notes"].append(note)
+
+    ordered = sorted(visits.values(), key=lambda v: (v["visit_date"] == "unknown", v["visit_date"]))
+    return {
+        "petId": petId,
+        "visits": [
+            {"visit_date": v["visit_date"], "records": v["records"], "notes": ", ".join(v["notes"])}
+            for v in ordered
+        ],
+    }
 
-    return extracted_json
+
+_chunk_pool = None
+_chunk_pool_lock = threading.Lock()
+
+
+def _get_chunk_pool() -> ThreadPoolExecutor:
+    global _chunk_pool
+    with _chunk_pool_lock:
+        if _chunk_pool is None:
+            _chunk_pool = ThreadPoolExecutor(max_workers=settings.LLM_CHUNK_CONCURRENCY, thread_name_prefix="llm-chunk")
+        return _chunk_pool
+
+
+def extract_with_llm(pages: list[str] | str, petId: int) -> dict:
+    """
+    Send the report to the LLM. Long reports are split into page-aligned chunks that
+    run concurrently (bounded by LLM_CHUNK_CONCURRENCY) and are merged afterwards.
+    """
+    if isinstance(pages, str):
+        pages = [pages]
+    chunks = chunk_pages(pages, settings.LLM_CHUNK_MAX_CHARS)
+    client = get_llm_client()
+
+    # The markdown goes inline with the prompt; no file upload/delete round trip
+    if len(chunks) == 1:
+        with stage("llm"):
+            result = client.generate(build_prompt(petId), chunks[0])
+        print(f"LLM extraction took {result.latency_s:.2f}s over {result.attempts} attempt(s)")
+        return parse_llm_json(result.text)
+
+    started = time.time()
+    header = pages[0][:settings.LLM_CHUNK_HEADER_CHARS] if pages else None
+    prompt = build_prompt(petId, header=header)
+    futures = [_get_chunk_pool().submit(client.generate, prompt, chunk) for chunk in chunks]
+    with stage("llm"):
+        results = [f.result() for f in futures]
+    parts = [parse_llm_json(r.text) for r in results]
+    print(f"LLM extraction of {len(chunks)} chunks took {time.time() - started:.2f}s")
+    return merge_extractions(parts, petId)
 
 
 def insert_extracted_labs_to_db(db: Session, json_path: str, petId: int):
     with open(json_path, "r", encoding="utf-8") as f:
         extracted_json = json.load(f)
 
-    visits = extracted_json.get("visits", [])
-    for visit in visits:
-        if not visit:
-            continue
-        visit_date_str = visit.get("visit_date")
-        visit_date = None if visit_date_str in ("unknown", None) else datetime.strptime(visit_date_str, "%Y-%m-%d").date()
-
-        lab_json_str = str(sorted(visit.get("records", []), key=lambda x: x.get("test_name")))
-        lab_hash = hashlib.md5(lab_json_str.encode()).hexdigest()
-
-        existing_lab = db.query(Lab).filter(
-            Lab.pet_id == petId,
-            Lab.visit_date == visit_date,
-            Lab.pdf_path == json_path
-        ).first()
-        if existing_lab:
-            print(f"Duplicate lab for pet {petId} on {visit_date}, skipping")
-            continue
-
-        lab = Lab(
-            pet_id=petId,
-            visit_date=visit_date,
-            created_at=datetime.now(timezone.utc),
-            lab_hash=lab_hash,
-            pdf_path=json_path
-        )
-        db.add(lab)
-        db.flush()
-
-        for record in visit.get("records", []):
-            if not record:
-                continue
-            test = LabTest(
-                lab_id=lab.id,
-                test_name=record.get("test_name"),
-                value=record.get("value"),
-                unit=record.get("unit"),
-                reference_range=record.get("reference_range")
-            )
-            db.add(test)
-
-    db.commit()
+    report = ingest_labs(db, extracted_json, petId, source_path=json_path)
+    print(f"Lab ingest for pet {petId}: {report}")
     return extracted_json
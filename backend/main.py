@@ -1,22 +1,42 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Form, Query, APIRouter
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Form
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-import os, tempfile, json
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
 from typing import List
 
-from .routers import pets
-from .llm_parser import extract_data_from_pdf
-from .database import Base, engine, get_db
-from . import models, schemas
+from .routers import pets, jobs, labs
+from .jobs import get_job_backend, shutdown_job_backend
+from .write_queue import shutdown_writer
+from .config import settings
+from .database import dispose_async_engine, get_async_db
+from .init_db import init_schema
+from . import extraction_cache, ocr, auth_cache, artifacts, metrics, images
 from .routers.auth import router as auth_router
-from .security import get_current_user
+from .security import Principal, get_current_principal
+from .static_files import ImmutableStaticFiles
+from .uploads import UploadLimitMiddleware
 
 load_dotenv()
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Pet Management API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema setup happens here instead of at import so workers/tests importing the app stay cheap
+    if settings.AUTO_MIGRATE:
+        init_schema()
+    yield
+    shutdown_job_backend()
+    ocr.shutdown_ocr_pool()
+    # image tasks still write through the writer, so drain them first
+    images.shutdown_images()
+    shutdown_writer()
+    artifacts.shutdown_artifacts()
+    await dispose_async_engine()
+
+
+app = FastAPI(title="Pet Management API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -24,10 +44,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UploadLimitMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
 
 # Routers
 app.include_router(auth_router)
 app.include_router(pets.router)
+app.include_router(jobs.router)
+app.include_router(labs.router)
+
+# Pet photos; names are content hashes, so responses are cacheable forever
+app.mount(f"{settings.MEDIA_URL}/pets", ImmutableStaticFiles(directory=images.UPLOAD_DIR, check_dir=False), name="pet-images")
 
 # Root
 @app.get("/")
@@ -36,44 +64,42 @@ async def read_root():
 
 # PDF processing
 @app.post("/process-pdf")
-async def process_pdf(file: UploadFile = File(...), petId: int = Form(...), db: Session = Depends(get_db)):
-    if not file.filename.lower().endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="File must be a PDF")
-
-    original_filename = os.path.splitext(file.filename)[0]
-    contents = await file.read()
-    max_size = 10 * 1024 * 1024
-    if len(contents) > max_size:
-        raise HTTPException(status_code=400, detail="File too large (>10MB)")
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(contents)
-        temp_pdf_path = tmp.name
-
+async def process_pdf(file: UploadFile = File(...), petId: int = Form(...)):
+    # Extraction is synchronous and slow, so it runs on the job pool instead of the event loop
+    upload = await jobs.save_pdf_upload(file)
+    job = jobs.submit_pdf_job(upload, petId)
     try:
-        extracted_data = extract_data_from_pdf(temp_pdf_path, petId, original_filename)
+        extracted_data = await get_job_backend().wait(job)
         return JSONResponse(status_code=200, content=extracted_data)
     except Exception as e:
         print(f"Error processing PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if os.path.exists(temp_pdf_path):
-            os.remove(temp_pdf_path)
 
-# Get labs for a pet
-@app.get("/api/labs")
-def get_labs(petId: int = Query(...), db: Session = Depends(get_db)):
-    labs = db.query(models.Lab).filter(models.Lab.pet_id == petId).all()
-    if not labs:
-        raise HTTPException(status_code=404, detail="No labs found")
+# Batch PDF processing: one request, per-file report, labs committed together
+@app.post("/process-pdf/batch")
+async def process_pdf_batch(
+    files: List[UploadFile] = File(...),
+    petId: int = Form(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    await labs.require_owned_pet(db, petId, current_user)
+    uploads = await jobs.save_pdf_uploads(files)
+    job = jobs.submit_pdf_batch_job(uploads, petId, current_user.id)
+    try:
+        report = await get_job_backend().wait(job)
+        return JSONResponse(status_code=200, content=report)
+    except Exception as e:
+        print(f"Error processing PDF batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Cache hit/miss counters
+@app.get("/api/cache/stats")
+def cache_stats():
+    return {**extraction_cache.stats(), "auth": auth_cache.stats()}
 
-    result = {"petId": petId, "visits": []}
-    for lab in labs:
-        visit = {
-            "visit_date": lab.visit_date.isoformat() if lab.visit_date else "unknown",
-            "records": [{"test_name": t.test_name, "value": t.value, "unit": t.unit, "reference_range": t.reference_range} for t in lab.tests],
-            "notes": getattr(lab, "notes", "")
-        }
-        result["visits"].append(visit)
-    result["visits"].sort(key=lambda x: x["visit_date"] or "")
-    return result
+# Prometheus scrape endpoint
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
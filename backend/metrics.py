@@ -0,0 +1,281 @@
+# backend/metrics.py
+"""
+Minimal Prometheus instrumentation: counters, gauges and histograms kept in process
+memory and rendered in the text exposition format at /metrics. Updates are a dict
+lookup and an add under a lock, cheap enough to leave on in production.
+Figures that other modules already track (cache and LLM stats, job queue) are read
+at scrape time by collectors instead of being double-counted.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import stages
+from .config import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_metrics = []
+_collectors = []
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts, sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+        for key, (counts, total, count) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{le} {running}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def add_collector(fn):
+    """`fn()` returns [(name, kind, help, {labels}, value), ...], evaluated on every scrape."""
+    _collectors.append(fn)
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    seen = set()
+    for fn in _collectors:
+        try:
+            samples = fn()
+        except Exception as e:
+            print(f"Metrics collector {getattr(fn, '__name__', fn)} failed: {e}")
+            continue
+        for name, kind, help, labels, value in samples:
+            if value is None:
+                continue
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ---- HTTP -----------------------------------------------------------------------
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served.", ("method",))
+http_db_queries = Histogram("http_request_db_queries", "SQL statements executed per HTTP request.", ("route",), COUNT_BUCKETS)
+http_db_seconds = Histogram("http_request_db_seconds", "Time spent in SQL per HTTP request.", ("route",))
+
+# ---- database -------------------------------------------------------------------
+
+db_queries = Counter("db_queries_total", "SQL statements executed.", ("dialect",))
+db_query_latency = Histogram("db_query_duration_seconds", "SQL statement latency.", ("dialect",))
+
+# ---- ingestion pipeline -----------------------------------------------------------
+
+stage_latency = Histogram("pipeline_stage_duration_seconds", "Extraction pipeline stage latency.", ("stage",), STAGE_BUCKETS)
+extractions = Counter("pipeline_extractions_total", "PDF extractions by path taken and outcome.", ("path", "outcome"))
+extraction_latency = Histogram("pipeline_extraction_duration_seconds", "End-to-end PDF extraction latency.", ("path",), STAGE_BUCKETS)
+ocr_pages = Counter("ocr_pages_total", "Pages sent to OCR, by whether text came back.", ("result",))
+llm_latency = Histogram("llm_request_duration_seconds", "LLM call latency including retries.", ("backend",), STAGE_BUCKETS)
+
+if settings.METRICS_ENABLED:
+    stages.add_listener(lambda name, elapsed: stage_latency.observe(elapsed, stage=name))
+
+
+# Per-request SQL tally; set by the HTTP middleware, shared with the threads/greenlets it spawns
+_request_queries = contextvars.ContextVar("metrics_request_queries", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    dialect = conn.dialect.name
+    db_queries.inc(dialect=dialect)
+    db_query_latency.observe(elapsed, dialect=dialect)
+    tally = _request_queries.get()
+    if tally is not None:
+        tally[0] += 1
+        tally[1] += elapsed
+
+
+if settings.METRICS_ENABLED:
+    # Registered on the Engine class so the sync, async and any later engines are all covered
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and SQL usage per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = {"code": 500}
+        tally = [0, 0.0]
+        token = _request_queries.set(tally)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec(method=method)
+            _request_queries.reset(token)
+            # The route template keeps label cardinality bounded (no ids in paths)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_requests.inc(method=method, route=route, status=status["code"])
+            http_latency.observe(elapsed, method=method, route=route)
+            http_db_queries.observe(tally[0], route=route)
+            http_db_seconds.observe(tally[1], route=route)
+
+
+# ---- collectors over stats the modules already keep -----------------------------
+
+def _collect_caches():
+    from . import auth_cache, extraction_cache
+
+    samples = []
+    for kind, counts in extraction_cache.stats().items():
+        for field in ("hits", "misses", "stores", "evictions"):
+            samples.append((f"extraction_cache_{field}_total", "counter", f"Extraction cache {field}.", {"kind": kind}, counts[field]))
+        samples.append(("extraction_cache_hit_ratio", "gauge", "Extraction cache hit ratio.", {"kind": kind}, counts["hit_rate"]))
+    for cache, counts in auth_cache.stats().items():
+        for field in ("hits", "misses"):
+            samples.append((f"auth_cache_{field}_total", "counter", f"Auth cache {field}.", {"cache": cache}, counts[field]))
+        samples.append(("auth_cache_entries", "gauge", "Auth cache entries.", {"cache": cache}, counts["size"]))
+        samples.append(("auth_cache_hit_ratio", "gauge", "Auth cache hit ratio.", {"cache": cache}, counts["hit_rate"]))
+    return samples
+
+
+def _collect_llm():
+    from .llm_client import client_stats
+
+    stats = client_stats()
+    if stats is None:
+        return []
+    labels = {"backend": stats["backend"]}
+    return [
+        (f"llm_{field}_total", "counter", f"LLM {field.replace('_', ' ')}.", labels, stats[field])
+        for field in ("calls", "attempts", "retries", "failures", "coalesced", "input_tokens", "output_tokens")
+    ]
+
+
+def _collect_jobs():
+    from .jobs import get_job_backend
+
+    stats = get_job_backend().stats()
+    samples = [("jobs_pending", "gauge", "Jobs queued or running.", {}, stats["pending"])]
+    for status, count in stats["by_status"].items():
+        samples.append(("jobs_retained", "gauge", "Retained jobs by status.", {"status": status}, count))
+    return samples
+
+
+add_collector(_collect_caches)
+add_collector(_collect_llm)
+add_collector(_collect_jobs)
@@ -9,11 +9,13 @@ from sqlalchemy import (
     ForeignKey,
     Boolean,
     Text,
-    UniqueConstraint
+    UniqueConstraint,
+    Index
 )
 from datetime import datetime
 from sqlalchemy.orm import relationship
 from .database import Base
+from .images import image_urls
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -23,6 +25,8 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     token_version = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
+    # bumped on every change to the user or their pet list; feeds ETags
+    version = Column(Integer, default=0, server_default="0", nullable=False)
     pets = relationship("Pet", back_populates="owner") 
 class Pet(Base):
     __tablename__ = "pets"
@@ -33,12 +37,23 @@ class Pet(Base):
     sex = Column(String, nullable=True)
     weight = Column(Float, nullable=True)
     img = Column(String, nullable=True) 
+    # {"thumb": name, "medium": name} under images.DERIVED_DIR, filled in after upload
+    img_variants = Column(Text, nullable=True)
+    # bumped on profile edits / lab ingestion respectively; feed ETags
+    version = Column(Integer, default=0, server_default="0", nullable=False)
+    labs_version = Column(Integer, default=0, server_default="0", nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="pets")
 
 
     # New relationship for labs
     labs = relationship("Lab", back_populates="pet", cascade="all, delete-orphan")
+    lab_summaries = relationship("LabSummary", cascade="all, delete-orphan")
+    documents = relationship("Document", cascade="all, delete-orphan")
+
+    @property
+    def images(self) -> dict | None:
+        return image_urls(self.img, self.img_variants)
 
 
 
@@ -51,11 +66,15 @@ class Lab(Base):
     pet_id = Column(Integer, ForeignKey("pets.id"), nullable=False)
     lab_hash = Column(String, nullable=True, index=True)
     pdf_path = Column(String, nullable=True, index=True)
+    # per-visit remarks from the report; searchable through the lab_search FTS index
+    notes = Column(Text, nullable=True)
 
     pet = relationship("Pet", back_populates="labs")
 
     __table_args__ = (
         UniqueConstraint('pet_id', 'visit_date', name='uix_pet_visit'),
+        # covers per-pet date ordering with id as the keyset tie-breaker
+        Index('ix_labs_pet_visit_date', 'pet_id', 'visit_date', 'id'),
     )
 
     tests = relationship("LabTest", back_populates="lab", cascade="all, delete-orphan")
@@ -73,5 +92,79 @@ class LabTest(Base):
     # Each test entry
     test_name = Column(String, nullable=False)
     value = Column(String, nullable=False)
+    # numeric part of `value`, parsed at ingest; null for qualitative results
+    value_num = Column(Float, nullable=True)
     unit = Column(String, nullable=True)
     reference_range = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index('ix_lab_tests_lab_test_name', 'lab_id', 'test_name'),
+    )
+
+
+class ExtractionCache(Base):
+    __tablename__ = "extraction_cache"
+    id = Column(Integer, primary_key=True, index=True)
+
+    # "pdf" = sha256 of the uploaded bytes, "markdown" = sha256 of the normalized markdown
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint('kind', 'key', name='uix_cache_kind_key'),
+    )
+
+
+class LabSummary(Base):
+    """Per-(pet, test) rollup kept in step with lab ingestion; see backend/lab_summary.py."""
+    __tablename__ = "lab_summaries"
+    id = Column(Integer, primary_key=True, index=True)
+    pet_id = Column(Integer, ForeignKey("pets.id"), nullable=False, index=True)
+    test_name = Column(String, nullable=False)
+
+    unit = Column(String, nullable=True)
+    reference_range = Column(String, nullable=True)
+    latest_lab_id = Column(Integer, nullable=True)
+    latest_date = Column(Date, nullable=True)
+    latest_value = Column(String, nullable=True)
+    latest_value_num = Column(Float, nullable=True)
+    abnormal = Column(Boolean, nullable=True)
+
+    count = Column(Integer, nullable=False, default=0)
+    numeric_count = Column(Integer, nullable=False, default=0)
+    min_value = Column(Float, nullable=True)
+    max_value = Column(Float, nullable=True)
+    sum_value = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('pet_id', 'test_name', name='uix_summary_pet_test'),
+    )
+
+
+class Document(Base):
+    """One row per uploaded report, written in the same transaction as its labs."""
+    __tablename__ = "documents"
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    pet_id = Column(Integer, ForeignKey("pets.id"), nullable=False)
+    filename = Column(String, nullable=False)
+    size = Column(Integer, nullable=False, default=0)
+    content_hash = Column(String, nullable=False)
+    # server-side artifact of the extraction; not exposed through the API
+    json_path = Column(String, nullable=True)
+    extraction_path = Column(String, nullable=True)
+    visit_count = Column(Integer, nullable=False, default=0)
+    test_count = Column(Integer, nullable=False, default=0)
+    labs_inserted = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('pet_id', 'content_hash', name='uix_document_pet_hash'),
+        # the owner's file list: filter by owner, newest first
+        Index('ix_documents_owner_created', 'owner_id', 'created_at', 'id'),
+    )
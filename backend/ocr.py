@@ -0,0 +1,116 @@
+# backend/ocr.py
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from . import metrics
+from .config import settings
+
+# PyMuPDF, pytesseract and PIL are imported inside the functions that need them
+# so importing the app doesn't pay for them.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = settings.OCR_WORKERS or os.cpu_count() or 1
+            # Never fork: the pool is started from a job thread of a process already running
+            # the event loop, thread pools and DB pools, and a forked child can inherit a lock
+            # another thread held. forkserver children fork from a clean single-threaded
+            # server; spawn is the fallback where it's unavailable (Windows).
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return _pool
+
+
+def shutdown_ocr_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def pages_needing_ocr(doc, min_chars: int | None = None) -> tuple[list[int], list[int]]:
+    """Split page indexes of an open fitz.Document into (text_pages, scanned_pages) by text layer."""
+    min_chars = settings.OCR_MIN_TEXT_CHARS if min_chars is None else min_chars
+    text_pages, scanned_pages = [], []
+    for i, page in enumerate(doc):
+        text = page.get_text("text")
+        if sum(not c.isspace() for c in text) >= min_chars:
+            text_pages.append(i)
+        else:
+            scanned_pages.append(i)
+    return text_pages, scanned_pages
+
+
+def ocr_page_group(pdf_bytes: bytes, page_indexes: list[int], dpi: int, grayscale: bool, psm: int, timeout_s: int) -> dict[int, str]:
+    """
+    Render and OCR a group of pages from an in-memory PDF. Runs inside a pool worker,
+    so the PDF bytes cross the process boundary once per group rather than per page.
+    A page that exceeds its Tesseract time budget or fails comes back as an empty string.
+    """
+    import fitz  # PyMuPDF
+    import pytesseract
+    from PIL import Image
+
+    # --- Ensure pytesseract points to Tesseract executable ---
+    if settings.TESSERACT_CMD:
+        pytesseract.pytesseract.tesseract_cmd = settings.TESSERACT_CMD
+
+    results = {}
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for i in page_indexes:
+            try:
+                pix = doc[i].get_pixmap(dpi=dpi, colorspace=colorspace)
+                with Image.open(io.BytesIO(pix.tobytes("png"))) as img:
+                    results[i] = pytesseract.image_to_string(img, config=f"--psm {psm}", timeout=timeout_s).strip()
+            except RuntimeError as e:
+                print(f"OCR for page {i+1} exceeded its time budget: {e}")
+                results[i] = ""
+            except Exception as e:
+                print(f"OCR for page {i+1} failed: {e}")
+                results[i] = ""
+    return results
+
+
+def ocr_pages(pdf_bytes: bytes, page_indexes: list[int]) -> dict[int, str]:
+    """OCR the given pages in parallel on the process pool, one page group per worker."""
+    if not page_indexes:
+        return {}
+
+    timeout_s = settings.OCR_PAGE_TIMEOUT_S
+    workers = settings.OCR_WORKERS or os.cpu_count() or 1
+    groups = [page_indexes[g::workers] for g in range(min(workers, len(page_indexes)))]
+    pool = _get_pool()
+    futures = [
+        (group, pool.submit(
+            ocr_page_group, pdf_bytes, group, settings.OCR_DPI, settings.OCR_GRAYSCALE, settings.OCR_PSM, timeout_s
+        ))
+        for group in groups
+    ]
+
+    results = {}
+    for group, future in futures:
+        try:
+            # Tesseract enforces the per-page budget itself; the extra margin covers rendering
+            results.update(future.result(timeout=timeout_s * len(group) + 30))
+        except FutureTimeout:
+            print(f"OCR for pages {[i + 1 for i in group]} exceeded its time budget")
+            future.cancel()
+            results.update({i: "" for i in group})
+        except Exception as e:
+            print(f"OCR for pages {[i + 1 for i in group]} failed: {e}")
+            results.update({i: "" for i in group})
+    empty = sum(1 for text in results.values() if not text)
+    metrics.ocr_pages.inc(len(results) - empty, result="text")
+    metrics.ocr_pages.inc(empty, result="empty")
+    return results
@@ -0,0 +1,17 @@
+# backend/rebuild_lab_summary.py
+# Recompute lab_summaries for every pet (or the ids given) from lab_tests.
+# Run with: python -m backend.rebuild_lab_summary [pet_id ...]
+import sys
+
+from backend.database import SessionLocal
+from backend.lab_summary import rebuild_pet
+from backend.models import Pet
+
+
+if __name__ == "__main__":
+    with SessionLocal() as db:
+        pet_ids = [int(a) for a in sys.argv[1:]] or [row.id for row in db.query(Pet.id)]
+        for pet_id in pet_ids:
+            rebuild_pet(db, pet_id)
+            db.commit()
+    print(f"Rebuilt lab summaries for {len(pet_ids)} pet(s)")
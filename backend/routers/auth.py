@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from ..database import get_db
-from ..models import User, Pet
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
+from ..models import Document, User, Pet
 from ..schemas import UserCreate, UserOut, TokenPair, UserWithPets, PetOut, BaseModel, UserUpdate
-from ..security import hash_password, verify_password, make_token, parse_token, get_current_user
+from ..security import Principal, hash_password, verify_password, make_token, parse_token, get_current_principal, get_current_user
 from ..config import settings
+from .. import auth_cache
+from ..etags import check_etag, make_etag
 from pydantic import BaseModel
-import os
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Literal, Optional
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -26,28 +31,29 @@ def _issue_tokens(user: User) -> TokenPair:
 
 # Register
 @router.post("/register", response_model=UserOut, status_code=201)
-def register(payload: UserCreate, db: Session = Depends(get_db)):
+async def register(payload: UserCreate, db: AsyncSession = Depends(get_async_db)):
     email = payload.email.lower()
-    if db.query(User).filter_by(email=email).first():
+    if await db.scalar(select(User).filter_by(email=email)):
         raise HTTPException(400, "Email already registered")
 
+    # argon2 is CPU-bound; keep it off the event loop
     user = User(
         name=payload.name,
         email=email,
-        hashed_password=hash_password(payload.password)
+        hashed_password=await run_in_threadpool(hash_password, payload.password)
     )
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 # Login
 @router.post("/login", response_model=TokenPair)
-def login(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     email = form.username.lower()
-    user = db.query(User).filter_by(email=email).first()
-    if not user or not verify_password(form.password, user.hashed_password) or not user.is_active:
+    user = await db.scalar(select(User).filter_by(email=email))
+    if not user or not await run_in_threadpool(verify_password, form.password, user.hashed_password) or not user.is_active:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     return _issue_tokens(user)
 
@@ -56,13 +62,13 @@ class RefreshIn(BaseModel):
     refresh_token: str
 
 @router.post("/refresh", response_model=TokenPair)
-def refresh(payload: RefreshIn, db: Session = Depends(get_db)):
+async def refresh(payload: RefreshIn, db: AsyncSession = Depends(get_async_db)):
     data = parse_token(payload.refresh_token)
     if not data or data.get("scope") != "refresh":
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
     user_id = int(data.get("sub"))
-    user = db.query(User).get(user_id)
+    user = await db.get(User, user_id)
     if not user or data.get("ver") != user.token_version:
         raise HTTPException(status_code=401, detail="Token no longer valid")
 
@@ -70,18 +76,23 @@ def refresh(payload: RefreshIn, db: Session = Depends(get_db)):
 
 # Logout
 @router.post("/logout")
-def logout(payload: RefreshIn, db: Session = Depends(get_db)):
+async def logout(payload: RefreshIn, db: AsyncSession = Depends(get_async_db)):
     data = parse_token(payload.refresh_token)
     if data:
-        user = db.get(User, int(data["sub"]))
+        user = await db.get(User, int(data["sub"]))
         if user:
             user.token_version += 1
-            db.commit()
+            await db.commit()
+            auth_cache.invalidate_user(user.id)
     return {"ok": True}
 
 @router.get("/me", response_model=UserWithPets)
-def read_current_user(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    pets_list = [PetOut.from_orm(p) for p in current_user.pets]
+async def read_current_user(request: Request, response: Response, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    not_modified = check_etag(request, response, make_etag("me", current_user.id, current_user.version))
+    if not_modified:
+        return not_modified
+    pets = await db.scalars(select(Pet).where(Pet.owner_id == current_user.id))
+    pets_list = [PetOut.from_orm(p) for p in pets]
     return UserWithPets(
         id=current_user.id,
         name=current_user.name,
@@ -90,9 +101,9 @@ def read_current_user(current_user: User = Depends(get_current_user), db: Sessio
         pets=pets_list
     )
 @router.put("/me", response_model=UserOut)
-def update_current_user(
+async def update_current_user(
     payload: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     updated = False
@@ -103,14 +114,14 @@ def update_current_user(
 
     if payload.email and payload.email != current_user.email:
         email_lower = payload.email.lower()
-        if db.query(User).filter(User.email == email_lower, User.id != current_user.id).first():
+        if await db.scalar(select(User).where(User.email == email_lower, User.id != current_user.id)):
             raise HTTPException(400, "Email already in use")
         current_user.email = email_lower
         current_user.token_version += 1
         updated = True
 
     if payload.password:
-        current_user.hashed_password = hash_password(payload.password)
+        current_user.hashed_password = await run_in_threadpool(hash_password, payload.password)
         current_user.token_version += 1
         updated = True
 
@@ -119,47 +130,79 @@ def update_current_user(
         updated = True
 
     if updated:
-        db.commit()
-        db.refresh(current_user)
+        current_user.version += 1
+        await db.commit()
+        auth_cache.invalidate_user(current_user.id)
+        await db.refresh(current_user)
 
     return current_user
 
+_FILE_SORTS = {"date": Document.created_at, "name": Document.filename, "size": Document.size}
+
+
+def document_dict(doc: Document) -> dict:
+    created = doc.created_at if doc.created_at.tzinfo else doc.created_at.replace(tzinfo=timezone.utc)
+    return {
+        "id": doc.id,
+        "petId": doc.pet_id,
+        "title": doc.filename,
+        "size": f"{doc.size / (1024*1024):.2f}Mb",
+        "size_bytes": doc.size,
+        "date": created.timestamp(),
+        "created_at": created.isoformat(),
+        "content_hash": doc.content_hash,
+        "extraction_path": doc.extraction_path,
+        "visits": doc.visit_count,
+        "tests": doc.test_count,
+    }
+
+
 @router.get("/files/user")
-def get_user_files(current_user: User = Depends(get_current_user)):
+async def get_user_files(
+    petId: Optional[int] = Query(None),
+    q: Optional[str] = Query(None, max_length=200),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    sort: Literal["date", "name", "size"] = Query("date"),
+    order: Literal["asc", "desc"] = Query("desc"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    Returns all JSON files for all pets associated with the current user.
-    Each file includes petId, title, and size in MB.
+    Returns the current user's uploaded reports from the documents index, one page at a
+    time. Filters by pet, filename substring and upload date; sorts by date, name or size.
+    The total count comes back with the page (window function), so it's a single query.
     """
-    # Get all pet IDs for the user
-    pet_ids = [pet.id for pet in current_user.pets]
-    if not pet_ids:
-        return []
-
-    # Set base directory for uploaded JSONs
-    # Adjust path relative to project root
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    base_dir = os.path.join(project_root, "Files", "Converted_JSONs")
-
-    print("Base dir exists:", os.path.exists(base_dir), " -> ", base_dir)
-
-
-    all_files = []
-
-    for pet_id in pet_ids:
-        pet_folder = os.path.join(base_dir, str(pet_id))
-        if not os.path.exists(pet_folder):
-            continue
-
-        for filename in os.listdir(pet_folder):
-            if filename.lower().endswith(".json"):
-                filepath = os.path.join(pet_folder, filename)
-                stat = os.stat(filepath)
-                all_files.append({
-                    "petId": pet_id,
-                    "title": filename,
-                    "path": filepath,
-                    "date": stat.st_mtime,          
-                    "size": f"{stat.st_size / (1024*1024):.2f}Mb"
-                })
-
-    return all_files
+    column = _FILE_SORTS[sort]
+    query = (
+        select(Document, func.count().over().label("total"))
+        .where(Document.owner_id == current_user.id)
+    )
+    if petId is not None:
+        query = query.where(Document.pet_id == petId)
+    if q:
+        pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.where(Document.filename.ilike(f"%{pattern}%", escape="\\"))
+    if date_from:
+        query = query.where(Document.created_at >= datetime.combine(date_from, dt_time.min))
+    if date_to:
+        query = query.where(Document.created_at < datetime.combine(date_to + timedelta(days=1), dt_time.min))
+    direction = (lambda c: c.asc()) if order == "asc" else (lambda c: c.desc())
+    query = query.order_by(direction(column), direction(Document.id)).limit(limit).offset(offset)
+
+    rows = (await db.execute(query)).all()
+    if rows:
+        total = rows[0].total
+    elif offset:
+        # Paged past the end: the window count came back empty, so count separately
+        total = await db.scalar(query.with_only_columns(func.count()).order_by(None).limit(None).offset(None))
+    else:
+        total = 0
+    return {
+        "items": [document_dict(row.Document) for row in rows],
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+    }
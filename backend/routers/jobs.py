@@ -0,0 +1,148 @@
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Form
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from fastapi.responses import JSONResponse
+import os
+
+from ..config import settings
+from ..database import get_async_db
+from ..jobs import get_job_backend, JobQueueFull
+from ..security import Principal, get_current_principal
+from ..uploads import StoredUpload, stream_upload_to_temp
+from ..llm_parser import extract_batch_from_pdfs, extract_data_from_pdf
+from .labs import require_owned_pet
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+async def save_pdf_upload(file: UploadFile) -> StoredUpload:
+    """Validate a PDF upload and stream it to a temp file."""
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+    return await stream_upload_to_temp(file, settings.MAX_PDF_UPLOAD_MB * 1024 * 1024, suffix=".pdf")
+
+
+async def save_pdf_uploads(files: List[UploadFile]) -> list[StoredUpload]:
+    """Validate and spool every PDF of a batch; nothing is kept if one of them is rejected."""
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    if len(files) > settings.BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files (max {settings.BATCH_MAX_FILES})")
+    uploads = []
+    try:
+        for file in files:
+            uploads.append(await save_pdf_upload(file))
+    except Exception:
+        _remove_uploads(uploads)
+        raise
+    return uploads
+
+
+def _remove_uploads(uploads: list[StoredUpload]):
+    for upload in uploads:
+        if os.path.exists(upload.path):
+            os.remove(upload.path)
+
+
+def run_pdf_extraction(temp_pdf_path: str, petId: int, original_filename: str, pdf_hash: str | None = None) -> dict:
+    """
+    Job body. The spooled upload is read into memory and removed as soon as the job
+    starts; the rest of the pipeline works on the bytes.
+    """
+    try:
+        with open(temp_pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+    finally:
+        if os.path.exists(temp_pdf_path):
+            os.remove(temp_pdf_path)
+    return extract_data_from_pdf(pdf_bytes, petId, original_filename, pdf_hash=pdf_hash)
+
+
+def submit_pdf_job(upload: StoredUpload, petId: int, owner_id: int | None = None):
+    original_filename = os.path.splitext(upload.original_filename)[0]
+    try:
+        return get_job_backend().submit(
+            "process-pdf",
+            run_pdf_extraction,
+            upload.path,
+            petId,
+            original_filename,
+            upload.sha256,
+            meta={"petId": petId, "filename": original_filename, "size": upload.size},
+            owner_id=owner_id,
+        )
+    except JobQueueFull as e:
+        os.remove(upload.path)
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def run_pdf_batch(uploads: list[StoredUpload], petId: int) -> dict:
+    """Job body for a batch upload; the spooled files are removed once it finishes."""
+    try:
+        return extract_batch_from_pdfs(
+            [(u.path, os.path.splitext(u.original_filename)[0], u.sha256) for u in uploads],
+            petId,
+        )
+    finally:
+        _remove_uploads(uploads)
+
+
+def submit_pdf_batch_job(uploads: list[StoredUpload], petId: int, owner_id: int | None = None):
+    try:
+        return get_job_backend().submit(
+            "process-pdf-batch",
+            run_pdf_batch,
+            uploads,
+            petId,
+            meta={
+                "petId": petId,
+                "filenames": [os.path.splitext(u.original_filename)[0] for u in uploads],
+                "size": sum(u.size for u in uploads),
+            },
+            owner_id=owner_id,
+        )
+    except JobQueueFull as e:
+        _remove_uploads(uploads)
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+# Submit a PDF and return immediately with a job id
+@router.post("/process-pdf", status_code=202)
+async def submit_process_pdf(
+    file: UploadFile = File(...),
+    petId: int = Form(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    await require_owned_pet(db, petId, current_user)
+    upload = await save_pdf_upload(file)
+    job = submit_pdf_job(upload, petId, current_user.id)
+    return JSONResponse(status_code=202, content=job.to_dict(include_result=False))
+
+
+# Submit several PDFs for one pet as a single job
+@router.post("/process-pdf/batch", status_code=202)
+async def submit_process_pdf_batch(
+    files: List[UploadFile] = File(...),
+    petId: int = Form(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    await require_owned_pet(db, petId, current_user)
+    uploads = await save_pdf_uploads(files)
+    job = submit_pdf_batch_job(uploads, petId, current_user.id)
+    return JSONResponse(status_code=202, content=job.to_dict(include_result=False))
+
+
+@router.get("/stats")
+def job_stats(current_user: Principal = Depends(get_current_principal)):
+    return get_job_backend().stats()
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str, current_user: Principal = Depends(get_current_principal)):
+    job = get_job_backend().get(job_id)
+    # Someone else's job looks exactly like a missing one
+    if not job or job.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -0,0 +1,452 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, bindparam, or_, func, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from datetime import date
+from typing import Literal, Optional
+import csv
+import io
+import json
+import re
+import time
+import zlib
+
+from ..database import AsyncSessionLocal, get_async_db
+from ..etags import check_etag, make_etag
+from ..lab_summary import summary_dict
+from ..models import Lab, LabSummary, LabTest, Pet
+from ..search import fts_query
+from ..security import Principal, get_current_principal
+
+router = APIRouter(tags=["labs"])
+
+
+def visit_dict(lab: Lab) -> dict:
+    return {
+        "visit_date": lab.visit_date.isoformat() if lab.visit_date else "unknown",
+        "records": [
+            {"test_name": t.test_name, "value": t.value, "unit": t.unit, "reference_range": t.reference_range}
+            for t in lab.tests
+        ],
+        "notes": lab.notes or "",
+    }
+
+
+def encode_cursor(lab: Lab) -> str:
+    return f"{lab.visit_date.isoformat() if lab.visit_date else 'unknown'}:{lab.id}"
+
+
+def decode_cursor(cursor: str) -> tuple[Optional[date], int]:
+    try:
+        day, lab_id = cursor.rsplit(":", 1)
+        return (None if day == "unknown" else date.fromisoformat(day)), int(lab_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor(cursor: str):
+    """Keyset condition for the (visit_date NULLS LAST, id) ordering."""
+    day, lab_id = decode_cursor(cursor)
+    if day is None:
+        return and_(Lab.visit_date.is_(None), Lab.id > lab_id)
+    return or_(
+        Lab.visit_date > day,
+        and_(Lab.visit_date == day, Lab.id > lab_id),
+        Lab.visit_date.is_(None),
+    )
+
+
+# Get labs for a pet, oldest visit first; undated visits come last
+@router.get("/api/labs")
+async def get_labs(
+    request: Request,
+    response: Response,
+    petId: int = Query(...),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    labs_version = await db.scalar(select(Pet.labs_version).where(Pet.id == petId))
+    if labs_version is not None:
+        etag = make_etag("labs", petId, labs_version, request.url.query)
+        not_modified = check_etag(request, response, etag)
+        if not_modified:
+            return not_modified
+
+    query = (
+        select(Lab)
+        .options(selectinload(Lab.tests))
+        .where(Lab.pet_id == petId)
+    )
+    if date_from:
+        query = query.where(Lab.visit_date >= date_from)
+    if date_to:
+        query = query.where(Lab.visit_date <= date_to)
+    if cursor:
+        query = query.where(after_cursor(cursor))
+    query = query.order_by(Lab.visit_date.is_(None), Lab.visit_date, Lab.id)
+    if limit:
+        query = query.limit(limit + 1)
+
+    labs = (await db.scalars(query)).all()
+    if not labs and not cursor:
+        raise HTTPException(status_code=404, detail="No labs found")
+
+    next_cursor = None
+    if limit and len(labs) > limit:
+        labs = labs[:limit]
+        next_cursor = encode_cursor(labs[-1])
+
+    return {"petId": petId, "visits": [visit_dict(lab) for lab in labs], "next_cursor": next_cursor}
+
+
+async def require_owned_pet(db: AsyncSession, pet_id: int, principal: Principal):
+    """404 unless the pet belongs to the caller, so other users' pet ids aren't confirmed."""
+    owned = await db.scalar(select(Pet.id).where(Pet.id == pet_id, Pet.owner_id == principal.id))
+    if owned is None:
+        raise HTTPException(status_code=404, detail="Pet not found")
+
+
+def parse_id_list(raw: Optional[str]) -> Optional[list[int]]:
+    if not raw:
+        return None
+    try:
+        return [int(x) for x in raw.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="petIds must be a comma-separated list of integers")
+
+
+# Labs for all of the current user's pets (or a subset) in one request
+@router.get("/api/labs/batch")
+async def get_labs_batch(
+    petIds: Optional[str] = Query(None, description="Comma-separated pet ids; defaults to all of the user's pets"),
+    latest: Optional[int] = Query(None, ge=1, le=500, description="Only the latest N visits per pet; undated visits fill in after all dated ones"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    requested = parse_id_list(petIds)
+    pet_query = select(Pet.id).where(Pet.owner_id == current_user.id)
+    if requested is not None:
+        pet_query = pet_query.where(Pet.id.in_(requested))
+    pet_ids = (await db.scalars(pet_query.order_by(Pet.id))).all()
+    if not pet_ids:
+        return {"pets": []}
+
+    query = select(Lab).options(selectinload(Lab.tests))
+    if latest:
+        # Rank each pet's visits newest first; undated visits rank after all dated ones
+        ranked = (
+            select(
+                Lab.id.label("lab_id"),
+                func.row_number().over(
+                    partition_by=Lab.pet_id,
+                    order_by=(Lab.visit_date.is_(None), Lab.visit_date.desc(), Lab.id.desc()),
+                ).label("rn"),
+            )
+            .where(Lab.pet_id.in_(pet_ids))
+            .subquery()
+        )
+        query = query.join(ranked, ranked.c.lab_id == Lab.id).where(ranked.c.rn <= latest)
+    else:
+        query = query.where(Lab.pet_id.in_(pet_ids))
+    labs = (await db.scalars(query.order_by(Lab.pet_id, Lab.visit_date.is_(None), Lab.visit_date, Lab.id))).all()
+
+    visits_by_pet = {pet_id: [] for pet_id in pet_ids}
+    for lab in labs:
+        visits_by_pet[lab.pet_id].append(visit_dict(lab))
+    return {"pets": [{"petId": pet_id, "visits": visits} for pet_id, visits in visits_by_pet.items()]}
+
+
+def downsample(dates: list, values: list, max_points: int) -> tuple[list, list]:
+    """Average consecutive points into `max_points` buckets; each bucket keeps its last date."""
+    n = len(values)
+    if n <= max_points:
+        return dates, values
+    out_dates, out_values = [], []
+    for b in range(max_points):
+        start = b * n // max_points
+        end = (b + 1) * n // max_points
+        bucket = values[start:end]
+        out_dates.append(dates[end - 1])
+        out_values.append(sum(bucket) / len(bucket))
+    return out_dates, out_values
+
+
+# Numeric time series per test, oldest first, in columnar form for charting
+@router.get("/api/labs/series")
+async def get_lab_series(
+    petId: int = Query(...),
+    tests: Optional[str] = Query(None, description="Comma-separated test names; defaults to all numeric tests"),
+    max_points: Optional[int] = Query(None, ge=2, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    await require_owned_pet(db, petId, current_user)
+    query = (
+        select(LabTest.test_name, Lab.visit_date, LabTest.value_num, LabTest.unit)
+        .join(Lab, Lab.id == LabTest.lab_id)
+        .where(
+            Lab.pet_id == petId,
+            Lab.visit_date.isnot(None),
+            LabTest.value_num.isnot(None),
+        )
+    )
+    if tests:
+        names = [t.strip() for t in tests.split(",") if t.strip()]
+        query = query.where(LabTest.test_name.in_(names))
+    rows = (await db.execute(query.order_by(LabTest.test_name, Lab.visit_date, Lab.id))).all()
+
+    series = {}
+    for test_name, visit_date, value_num, unit in rows:
+        entry = series.setdefault(test_name, {"dates": [], "values": [], "unit": None})
+        entry["dates"].append(visit_date.isoformat())
+        entry["values"].append(value_num)
+        if unit:
+            entry["unit"] = unit
+
+    if max_points:
+        for entry in series.values():
+            entry["dates"], entry["values"] = downsample(entry["dates"], entry["values"], max_points)
+
+    return {"petId": petId, "series": series}
+
+
+# Latest value, range stats and abnormal flag per test, from the summary table
+@router.get("/api/labs/summary")
+async def get_lab_summary(
+    petId: int = Query(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    await require_owned_pet(db, petId, current_user)
+    summaries = await db.scalars(
+        select(LabSummary)
+        .where(LabSummary.pet_id == petId)
+        .order_by(LabSummary.test_name)
+    )
+    return {"petId": petId, "tests": [summary_dict(s) for s in summaries]}
+
+
+EXPORT_COLUMNS = ("pet_id", "pet_name", "visit_date", "lab_id", "test_name", "value", "value_num", "unit", "reference_range")
+EXPORT_CHUNK_CHARS = 64 * 1024
+EXPORT_YIELD_PER = 1000
+
+
+async def _export_rows(query):
+    # A session of its own: the request-scoped one may be closed before the body is streamed
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_YIELD_PER))
+        async for row in result:
+            yield row
+
+
+async def _csv_chunks(rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    async for row in rows:
+        writer.writerow([
+            row.pet_id, row.pet_name, row.visit_date.isoformat() if row.visit_date else "",
+            row.lab_id, row.test_name, row.value, "" if row.value_num is None else row.value_num,
+            row.unit or "", row.reference_range or "",
+        ])
+        if buf.tell() >= EXPORT_CHUNK_CHARS:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+async def _ndjson_chunks(rows):
+    lines = []
+    size = 0
+    async for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, (
+            row.pet_id, row.pet_name, row.visit_date.isoformat() if row.visit_date else None,
+            row.lab_id, row.test_name, row.value, row.value_num, row.unit, row.reference_range,
+        )))
+        line = json.dumps(record) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_CHARS:
+            yield "".join(lines)
+            lines, size = [], 0
+    yield "".join(lines)
+
+
+async def _encode(chunks, gzip: bool):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if gzip else None
+    async for chunk in chunks:
+        data = chunk.encode("utf-8")
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    if compressor:
+        yield compressor.flush()
+
+
+# Full lab history as CSV or NDJSON, streamed row by row; one pet or all of the user's pets
+@router.get("/api/labs/export")
+async def export_labs(
+    fmt: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    petId: Optional[int] = Query(None, description="Defaults to all of the user's pets"),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    tests: Optional[str] = Query(None, description="Comma-separated test names"),
+    gzip: bool = Query(False),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    query = (
+        select(
+            Lab.pet_id, Pet.name.label("pet_name"), Lab.visit_date, Lab.id.label("lab_id"),
+            LabTest.test_name, LabTest.value, LabTest.value_num, LabTest.unit, LabTest.reference_range,
+        )
+        .select_from(LabTest)
+        .join(Lab, Lab.id == LabTest.lab_id)
+        .join(Pet, Pet.id == Lab.pet_id)
+        .where(Pet.owner_id == current_user.id)
+    )
+    if petId is not None:
+        await require_owned_pet(db, petId, current_user)
+        query = query.where(Lab.pet_id == petId)
+    if date_from:
+        query = query.where(Lab.visit_date >= date_from)
+    if date_to:
+        query = query.where(Lab.visit_date <= date_to)
+    if tests:
+        names = [t.strip() for t in tests.split(",") if t.strip()]
+        query = query.where(LabTest.test_name.in_(names))
+    query = query.order_by(Lab.pet_id, Lab.visit_date.is_(None), Lab.visit_date, Lab.id, LabTest.id)
+
+    chunks = _csv_chunks(_export_rows(query)) if fmt == "csv" else _ndjson_chunks(_export_rows(query))
+    filename = f"{'pet-' + str(petId) if petId is not None else 'pets'}-labs.{fmt}"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "private, no-store",
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    media_type = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(_encode(chunks, gzip), media_type=media_type, headers=headers)
+
+
+_FTS_SEARCH = text("""
+    SELECT rowid, lab_id, bm25(lab_search, 10.0, 2.0, 5.0) AS score,
+           snippet(lab_search, 2, '[', ']', '...', 12) AS snippet
+    FROM lab_search
+    WHERE lab_search MATCH :query AND pet_id IN :pet_ids
+    ORDER BY score
+    LIMIT :limit
+""").bindparams(bindparam("pet_ids", expanding=True))
+
+
+async def _fts_matches(db: AsyncSession, q: str, pet_ids: list[int], limit: int) -> list[dict]:
+    query = fts_query(q)
+    if query is None:
+        return []
+    rows = (await db.execute(_FTS_SEARCH, {"query": query, "pet_ids": pet_ids, "limit": limit})).all()
+    # even rowids are tests (2 * test id), odd ones visit notes (2 * lab id + 1); bm25 is lower-is-better
+    return [
+        {"kind": "test" if row.rowid % 2 == 0 else "note", "id": row.rowid // 2, "score": round(-row.score, 4),
+         "snippet": row.snippet if row.rowid % 2 else None}
+        for row in rows
+    ]
+
+
+async def _like_matches(db: AsyncSession, q: str, pet_ids: list[int], limit: int) -> list[dict]:
+    # Unranked fallback for databases without the FTS5 index
+    words = re.findall(r"\w+", q)
+    if not words:
+        return []
+    test_ids = await db.scalars(
+        select(LabTest.id).join(Lab, Lab.id == LabTest.lab_id)
+        .where(Lab.pet_id.in_(pet_ids), or_(*[LabTest.test_name.ilike(f"%{w}%") for w in words]))
+        .order_by(LabTest.id.desc()).limit(limit)
+    )
+    lab_ids = await db.scalars(
+        select(Lab.id)
+        .where(Lab.pet_id.in_(pet_ids), or_(*[Lab.notes.ilike(f"%{w}%") for w in words]))
+        .order_by(Lab.id.desc()).limit(limit)
+    )
+    matches = [{"kind": "note", "id": i, "score": None, "snippet": None} for i in lab_ids]
+    matches += [{"kind": "test", "id": i, "score": None, "snippet": None} for i in test_ids]
+    return matches[:limit]
+
+
+# Ranked full-text search over test names, units and visit notes of the user's pets
+@router.get("/api/search")
+async def search_labs(
+    q: str = Query(..., min_length=1, max_length=200),
+    petId: Optional[int] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    started = time.perf_counter()
+    pet_ids = (await db.scalars(select(Pet.id).where(Pet.owner_id == current_user.id))).all()
+    if petId is not None:
+        if petId not in pet_ids:
+            raise HTTPException(status_code=404, detail="Pet not found")
+        pet_ids = [petId]
+    if not pet_ids:
+        return {"query": q, "hits": [], "took_ms": 0.0}
+
+    matches = None
+    if db.get_bind().dialect.name == "sqlite":
+        try:
+            matches = await _fts_matches(db, q, pet_ids, limit)
+        except OperationalError as e:
+            print(f"FTS search unavailable, falling back to LIKE: {e}")
+    if matches is None:
+        matches = await _like_matches(db, q, pet_ids, limit)
+
+    # Visit context for the matched tests and notes, two primary-key lookups
+    test_ids = [m["id"] for m in matches if m["kind"] == "test"]
+    lab_ids = [m["id"] for m in matches if m["kind"] == "note"]
+    tests, notes = {}, {}
+    if test_ids:
+        rows = await db.execute(
+            select(LabTest, Lab.visit_date, Lab.pet_id, Pet.name)
+            .join(Lab, Lab.id == LabTest.lab_id).join(Pet, Pet.id == Lab.pet_id)
+            .where(LabTest.id.in_(test_ids))
+        )
+        tests = {row.LabTest.id: row for row in rows}
+    if lab_ids:
+        rows = await db.execute(
+            select(Lab.id, Lab.visit_date, Lab.pet_id, Lab.notes, Pet.name)
+            .join(Pet, Pet.id == Lab.pet_id)
+            .where(Lab.id.in_(lab_ids))
+        )
+        notes = {row.id: row for row in rows}
+
+    hits = []
+    for match in matches:
+        if match["kind"] == "test":
+            row = tests.get(match["id"])
+            if row is None:
+                continue
+            t = row.LabTest
+            hit = {"labId": t.lab_id, "test": {
+                "test_name": t.test_name, "value": t.value, "unit": t.unit, "reference_range": t.reference_range,
+            }}
+        else:
+            row = notes.get(match["id"])
+            if row is None:
+                continue
+            hit = {"labId": row.id, "notes": row.notes, "snippet": match["snippet"]}
+        hits.append({
+            "kind": match["kind"],
+            "score": match["score"],
+            "petId": row.pet_id,
+            "petName": row.name,
+            "visit_date": row.visit_date.isoformat() if row.visit_date else "unknown",
+            **hit,
+        })
+    return {"query": q, "hits": hits, "took_ms": round((time.perf_counter() - started) * 1000, 1)}
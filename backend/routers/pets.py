@@ -1,17 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from ..database import get_db
+from ..database import get_async_db
 from ..models import Pet, User
 from ..schemas import PetOut
+from ..config import settings
+from ..etags import check_etag, make_etag
+from ..uploads import stream_upload
+from .. import images
 from .auth import get_current_user
+from ..security import Principal, get_current_principal
 import os
 import uuid
 
 router = APIRouter(prefix="/pets", tags=["pets"])
 
-UPLOAD_DIR = "uploads/pets"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+UPLOAD_DIR = images.UPLOAD_DIR
+
+
+async def save_pet_image(image: UploadFile) -> str:
+    # Stream under a unique name, then rename to the content hash so identical uploads share a file.
+    # The extension comes from the decoded format: the media mount serves whatever is stored here.
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    temp_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}.upload")
+    stored = await stream_upload(image, temp_path, settings.MAX_IMAGE_UPLOAD_MB * 1024 * 1024)
+    ext = await run_in_threadpool(images.detect_image_ext, temp_path)
+    if ext is None:
+        os.remove(temp_path)
+        raise HTTPException(status_code=400, detail="Image must be a JPEG, PNG, WebP or GIF file")
+    file_path = os.path.join(UPLOAD_DIR, f"{stored.sha256[:20]}{ext}")
+    os.replace(temp_path, file_path)
+    return file_path
 
 # CREATE PET
 @router.post("", response_model=PetOut)
@@ -22,7 +43,7 @@ async def create_pet(
     sex: Optional[str] = Form(None),
     weight: Optional[float] = Form(None),
     image: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     pet = Pet(
@@ -35,30 +56,37 @@ async def create_pet(
     )
 
     if image:
-        ext = os.path.splitext(image.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{ext}"
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
-        with open(file_path, "wb+") as f:
-            f.write(await image.read())
-        pet.img = file_path
+        pet.img = await save_pet_image(image)
 
+    current_user.version += 1
     db.add(pet)
-    db.commit()
-    db.refresh(pet)
+    await db.commit()
+    await db.refresh(pet)
+    if pet.img:
+        images.schedule_processing(pet.id, pet.img)
     return PetOut.from_orm(pet)
 
 # LIST PETS
 @router.get("", response_model=List[PetOut])
-def list_pets(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    pets = db.query(Pet).filter(Pet.owner_id == current_user.id).all()
+async def list_pets(request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    not_modified = check_etag(request, response, make_etag("pets", current_user.id, current_user.version))
+    if not_modified:
+        return not_modified
+    pets = await db.scalars(select(Pet).where(Pet.owner_id == current_user.id))
     return [PetOut.from_orm(p) for p in pets]
 
 # GET PET
 @router.get("/{pet_id}", response_model=PetOut)
-def get_pet(pet_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    pet = db.query(Pet).filter(Pet.id == pet_id, Pet.owner_id == current_user.id).first()
-    if not pet:
+async def get_pet(pet_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(get_current_principal)):
+    pet_version = await db.scalar(
+        select(Pet.version).where(Pet.id == pet_id, Pet.owner_id == current_user.id)
+    )
+    if pet_version is None:
         raise HTTPException(status_code=404, detail="Pet not found")
+    not_modified = check_etag(request, response, make_etag("pet", pet_id, pet_version))
+    if not_modified:
+        return not_modified
+    pet = await db.get(Pet, pet_id)
     return PetOut.from_orm(pet)
 
 # UPDATE PET
@@ -71,10 +99,10 @@ async def update_pet(
     sex: Optional[str] = Form(None),
     weight: Optional[float] = Form(None),
     image: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    pet = db.query(Pet).filter(Pet.id == pet_id, Pet.owner_id == current_user.id).first()
+    pet = await db.scalar(select(Pet).where(Pet.id == pet_id, Pet.owner_id == current_user.id))
     if not pet:
         raise HTTPException(status_code=404, detail="Pet not found")
 
@@ -89,24 +117,31 @@ async def update_pet(
         if value is not None:
             setattr(pet, field, value)
 
+    previous = None
     if image:
-        ext = os.path.splitext(image.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{ext}"
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
-        with open(file_path, "wb+") as f:
-            f.write(await image.read())
-        pet.img = file_path
+        new_img = await save_pet_image(image)
+        if new_img != pet.img:
+            previous = (pet.img, pet.img_variants)
+            pet.img = new_img
+            pet.img_variants = None
 
-    db.commit()
-    db.refresh(pet)
+    pet.version += 1
+    current_user.version += 1
+    await db.commit()
+    await db.refresh(pet)
+    if previous is not None:
+        images.schedule_processing(pet.id, pet.img, *previous)
     return PetOut.from_orm(pet)
 
 # DELETE PET
 @router.delete("/{pet_id}")
-def delete_pet(pet_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    pet = db.query(Pet).filter(Pet.id == pet_id, Pet.owner_id == current_user.id).first()
+async def delete_pet(pet_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    pet = await db.scalar(select(Pet).where(Pet.id == pet_id, Pet.owner_id == current_user.id))
     if not pet:
         raise HTTPException(status_code=404, detail="Pet not found")
-    db.delete(pet)
-    db.commit()
+    files = (pet.img, pet.img_variants)
+    await db.delete(pet)
+    current_user.version += 1
+    await db.commit()
+    images.schedule_removal(*files)
     return {"ok": True}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Dict, Optional, List
 class UserBase(BaseModel):
     name: str
     email: EmailStr
@@ -45,6 +45,8 @@ class PetUpdate(BaseModel):
 class PetOut(PetBase):
     id: int
     owner_id: int
+    # URLs for "thumb", "medium" and "original"
+    images: Optional[Dict[str, str]] = None
 
     model_config = {
         "from_attributes": True
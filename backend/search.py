@@ -0,0 +1,113 @@
+# backend/search.py
+"""
+Full-text search over lab test names, units and visit notes.
+
+On SQLite this is an FTS5 table, `lab_search`, maintained by triggers on labs and
+lab_tests so every insert, update and delete path (ingest, pet deletion cascades,
+scripts) keeps it in sync. Each test is one row (rowid = 2 * test id) and each
+visit with notes is one row (rowid = 2 * lab id + 1), so trigger deletes are
+rowid lookups. Other databases fall back to an unranked LIKE search.
+"""
+import re
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+_DDL = [
+    """
+    CREATE VIRTUAL TABLE lab_search USING fts5(
+        test_name, unit, notes,
+        pet_id UNINDEXED, lab_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER lab_search_test_insert AFTER INSERT ON lab_tests BEGIN
+        INSERT INTO lab_search (rowid, test_name, unit, notes, pet_id, lab_id)
+        SELECT new.id * 2, new.test_name, coalesce(new.unit, ''), '', labs.pet_id, new.lab_id
+        FROM labs WHERE labs.id = new.lab_id;
+    END
+    """,
+    """
+    CREATE TRIGGER lab_search_test_update AFTER UPDATE OF test_name, unit ON lab_tests BEGIN
+        DELETE FROM lab_search WHERE rowid = old.id * 2;
+        INSERT INTO lab_search (rowid, test_name, unit, notes, pet_id, lab_id)
+        SELECT new.id * 2, new.test_name, coalesce(new.unit, ''), '', labs.pet_id, new.lab_id
+        FROM labs WHERE labs.id = new.lab_id;
+    END
+    """,
+    """
+    CREATE TRIGGER lab_search_test_delete AFTER DELETE ON lab_tests BEGIN
+        DELETE FROM lab_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER lab_search_lab_insert AFTER INSERT ON labs
+    WHEN new.notes IS NOT NULL AND new.notes != '' BEGIN
+        INSERT INTO lab_search (rowid, test_name, unit, notes, pet_id, lab_id)
+        VALUES (new.id * 2 + 1, '', '', new.notes, new.pet_id, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER lab_search_lab_update AFTER UPDATE OF notes ON labs BEGIN
+        DELETE FROM lab_search WHERE rowid = old.id * 2 + 1;
+        INSERT INTO lab_search (rowid, test_name, unit, notes, pet_id, lab_id)
+        SELECT new.id * 2 + 1, '', '', new.notes, new.pet_id, new.id
+        WHERE new.notes IS NOT NULL AND new.notes != '';
+    END
+    """,
+    """
+    CREATE TRIGGER lab_search_lab_delete AFTER DELETE ON labs BEGIN
+        DELETE FROM lab_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+_BACKFILL = [
+    """
+    INSERT INTO lab_search (rowid, test_name, unit, notes, pet_id, lab_id)
+    SELECT lab_tests.id * 2, lab_tests.test_name, coalesce(lab_tests.unit, ''), '', labs.pet_id, labs.id
+    FROM lab_tests JOIN labs ON labs.id = lab_tests.lab_id
+    """,
+    """
+    INSERT INTO lab_search (rowid, test_name, unit, notes, pet_id, lab_id)
+    SELECT id * 2 + 1, '', '', notes, pet_id, id FROM labs
+    WHERE notes IS NOT NULL AND notes != ''
+    """,
+]
+
+
+def ensure_search_index(engine: Engine):
+    """Create the FTS5 table and its triggers if missing, indexing existing rows once."""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'lab_search'")
+        ).first()
+        if exists:
+            return
+        try:
+            conn.execute(text(_DDL[0]))
+        except Exception as e:
+            # SQLite built without FTS5; /api/search falls back to LIKE
+            print("Could not create the lab_search FTS5 index:", e)
+            return
+        for statement in _DDL[1:] + _BACKFILL:
+            conn.execute(text(statement))
+        print("Created lab_search full-text index")
+
+
+def fts_query(raw: str) -> str | None:
+    """
+    Turn free text into a safe FTS5 query. Words are quoted so FTS5 syntax in the
+    input is inert and OR-ed so "ALT results" still finds ALT; bm25 ranks rows that
+    match more (and rarer) words first. The last word also matches as a prefix.
+    """
+    words = re.findall(r"\w+", raw, flags=re.UNICODE)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " OR ".join(terms)
@@ -1,12 +1,16 @@
+import time
 from datetime import datetime, timedelta
+from typing import NamedTuple
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from . import auth_cache
 from .config import settings
-from .database import get_db
+from .database import get_async_db
 from .models import User
 
 _pwd = CryptContext(schemes=["argon2"], deprecated="auto")
@@ -47,16 +51,68 @@ def parse_token(token: str) -> dict | None:
     except JWTError:
         return None
     
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
-    data = parse_token(token)
-    if not data or data.get("scope") != "access":
+class Principal(NamedTuple):
+    id: int
+    token_version: int
+    is_active: bool
+
+
+def _decode_access_token(token: str) -> dict:
+    now = time.time()
+    data = auth_cache.tokens.get(token)
+    if data is None:
+        data = parse_token(token)
+        if not data or data.get("scope") != "access":
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        auth_cache.tokens.set(token, data, ttl_s=data.get("exp", now) - now)
+    elif data.get("exp", 0) <= now:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return data
 
-    user = db.query(User).get(int(data["sub"]))
-    if not user or not user.is_active or data.get("ver") != user.token_version:
+
+def _check_principal(data: dict, principal: Principal | None):
+    if not principal or not principal.is_active or data.get("ver") != principal.token_version:
         raise HTTPException(status_code=401, detail="Not authorized")
 
+
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> Principal:
+    """
+    Authenticate without loading the User row when (token_version, is_active) is cached.
+    Use this for endpoints that only need the caller's id.
+    """
+    data = _decode_access_token(token)
+    user_id = int(data["sub"])
+    principal = auth_cache.principals.get(user_id)
+    if principal is None:
+        user = await db.get(User, user_id)
+        if user:
+            principal = Principal(user.id, user.token_version, user.is_active)
+            auth_cache.principals.set(user_id, principal)
+    _check_principal(data, principal)
+    return principal
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    # The row is needed anyway, so this path only refreshes the principal cache
+    data = _decode_access_token(token)
+    user = await db.get(User, int(data["sub"]))
+    principal = None
+    if user:
+        principal = Principal(user.id, user.token_version, user.is_active)
+        auth_cache.principals.set(user.id, principal)
+    _check_principal(data, principal)
     return user
+
+
+# Any flushed change to token_version/is_active drops the cached principal
+@event.listens_for(User, "after_update")
+def _invalidate_principal_on_update(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.token_version.history.has_changes() or state.attrs.is_active.history.has_changes():
+        auth_cache.invalidate_user(target.id)
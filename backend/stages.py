@@ -0,0 +1,42 @@
+# backend/stages.py
+"""
+Named timings for the ingestion pipeline. Wrap a step in `with stage("llm"):`;
+callers that want the numbers for one extraction wrap it in `record()`, and
+process-wide consumers register a listener.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+_listeners = []
+
+
+def add_listener(fn):
+    """`fn(name, elapsed_s)` is called after every stage, on the thread that ran it."""
+    _listeners.append(fn)
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings = getattr(_local, "timings", None)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+        for fn in _listeners:
+            fn(name, elapsed)
+
+
+@contextmanager
+def record():
+    """Collect {stage: seconds} for the stages run on this thread inside the block."""
+    previous = getattr(_local, "timings", None)
+    _local.timings = {}
+    try:
+        yield _local.timings
+    finally:
+        _local.timings = previous
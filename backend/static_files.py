@@ -0,0 +1,16 @@
+# backend/static_files.py
+from starlette.staticfiles import StaticFiles
+
+from .config import settings
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files whose names change with their content, so clients may cache them forever."""
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        # Never let a browser reinterpret a stored file as something other than its declared type
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = f"public, max-age={settings.MEDIA_MAX_AGE_S}, immutable"
+        return response
@@ -0,0 +1,225 @@
+# backend/table_parser.py
+"""
+Rule-based extractor for the reference-lab layouts that pymupdf4llm already renders
+as markdown tables. Produces the same {"petId", "visits": [...]} schema as the LLM
+path, plus a confidence score the caller uses to decide whether to fall back.
+Free text under a notes/comments-style label becomes the visit's notes, so reports
+taken by this path stay searchable by their remarks like LLM-extracted ones.
+"""
+import re
+from datetime import datetime
+
+from .lab_values import parse_numeric_value
+
+_HEADER_SYNONYMS = {
+    "test": ("test", "test name", "analyte", "parameter", "assay", "name"),
+    "result": ("result", "results", "value", "patient result"),
+    "unit": ("unit", "units"),
+    "reference": (
+        "reference", "reference range", "ref range", "ref. range", "range",
+        "normal range", "reference interval", "ref. interval", "expected range",
+    ),
+}
+
+_DATE_FORMATS = (
+    "%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%d-%b-%Y", "%d %b %Y",
+    "%b %d, %Y", "%B %d, %Y", "%b %d %Y", "%B %d %Y", "%Y/%m/%d",
+)
+_DATE_RE = re.compile(
+    r"\b(\d{4}-\d{2}-\d{2}|\d{4}/\d{2}/\d{2}|\d{1,2}/\d{1,2}/\d{2,4}|\d{1,2}[- ][A-Za-z]{3}[- ]\d{4}"
+    r"|[A-Za-z]{3,9} \d{1,2},? \d{4})\b"
+)
+# Labels that mark the visit/collection date, as opposed to e.g. a birth date
+_DATE_LABEL_RE = re.compile(r"(collect|sample|visit|draw|received|report|test|result)\w*\s*date|date\s*(collected|of service|received)", re.I)
+_NOT_VISIT_DATE_RE = re.compile(r"birth|dob|printed", re.I)
+# Starts a free-text remarks section; text after the label on the same line is kept
+_NOTE_LABEL_RE = re.compile(
+    r"^[#>*_\-\s]*(notes?|comments?|remarks?|interpretation|impression|assessment|findings)\b[*_\s]*:?[*_\s]*(.*)$",
+    re.I,
+)
+
+
+def parse_date(text: str):
+    text = text.strip().replace(".", "")
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _clean_cell(cell: str) -> str:
+    cell = re.sub(r"<br\s*/?>", " ", cell)
+    cell = cell.replace("**", "").replace("__", "")
+    return re.sub(r"\s+", " ", cell).strip()
+
+
+def _split_row(line: str) -> list[str]:
+    return [_clean_cell(c) for c in line.strip().strip("|").split("|")]
+
+
+def _is_separator(cells: list[str]) -> bool:
+    return all(re.fullmatch(r":?-{2,}:?", c) or c == "" for c in cells)
+
+
+def _classify_header(cells: list[str]) -> dict | None:
+    """Map column roles to indexes; date-valued header cells become per-visit result columns."""
+    roles, date_columns = {}, {}
+    for idx, cell in enumerate(cells):
+        lowered = cell.lower()
+        day = parse_date(cell)
+        if day:
+            date_columns[idx] = day
+            continue
+        for role, names in _HEADER_SYNONYMS.items():
+            if role not in roles and lowered in names:
+                roles[role] = idx
+                break
+    if "test" not in roles or not ("result" in roles or date_columns):
+        return None
+    roles["dates"] = date_columns
+    return roles
+
+
+def _find_dates(line: str):
+    for match in _DATE_RE.finditer(line):
+        day = parse_date(match.group(1))
+        if day:
+            yield day
+
+
+def _clean_text(line: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"^[#>*_\-\s]+|[*_]+", " ", line)).strip()
+
+
+def _iter_blocks(pages: list[str]):
+    """
+    Yield ("table", date, rows) for each markdown table and ("note", date, text) for
+    each line of a notes section, with the visit date in effect above it. A notes
+    section runs from its label to the next blank line or table.
+    """
+    doc_date = None
+    for page in pages:
+        current_date = None
+        in_notes = False
+        lines = page.splitlines()
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            if line.lstrip().startswith("|"):
+                rows = []
+                while i < len(lines) and lines[i].lstrip().startswith("|"):
+                    rows.append(_split_row(lines[i]))
+                    i += 1
+                in_notes = False
+                yield "table", current_date or doc_date, rows
+                continue
+            if not line.strip():
+                in_notes = False
+            else:
+                label = _NOTE_LABEL_RE.match(line)
+                if label:
+                    in_notes = True
+                    line_text = label.group(2)
+                else:
+                    line_text = line if in_notes else ""
+                line_text = _clean_text(line_text)
+                if line_text:
+                    yield "note", current_date or doc_date, line_text
+            if not _NOT_VISIT_DATE_RE.search(line):
+                dates = list(_find_dates(line))
+                if dates:
+                    if _DATE_LABEL_RE.search(line):
+                        current_date = dates[0]
+                        doc_date = doc_date or dates[0]
+                    elif doc_date is None:
+                        doc_date = dates[0]
+            i += 1
+
+
+def _attach_notes(visits: dict, notes: list):
+    """Join note lines onto their visit; undated ones, or ones dated without results, go to the latest visit."""
+    dated_keys = sorted(k for k in visits if k != "unknown")
+    fallback = dated_keys[-1] if dated_keys else next(iter(visits), None)
+    collected: dict = {}
+    for day, text in notes:
+        key = day.isoformat() if day else None
+        key = key if key in visits else fallback
+        if key is not None and text not in collected.setdefault(key, []):
+            collected[key].append(text)
+    for key, lines in collected.items():
+        visits[key]["notes"] = " ".join(lines)
+
+
+def parse_report(pages: list[str], petId: int) -> tuple[dict, float]:
+    """
+    Returns (extraction, confidence in [0, 1]). Confidence is the share of table rows
+    that yielded a test name and value, scaled down when values are mostly
+    non-numeric or no visit date could be found.
+    """
+    visits: dict = {}
+    rows_seen = rows_ok = numeric = 0
+    dated = True
+
+    notes = []
+    for kind, table_date, block in _iter_blocks(pages):
+        if kind == "note":
+            notes.append((table_date, block))
+            continue
+        rows = block
+        if len(rows) < 2:
+            continue
+        header = _classify_header(rows[0])
+        if header is None:
+            continue
+        body = rows[2:] if _is_separator(rows[1]) else rows[1:]
+
+        if header["dates"]:
+            result_columns = list(header["dates"].items())
+        else:
+            result_columns = [(header["result"], table_date)]
+            if table_date is None:
+                dated = False
+
+        for cells in body:
+            if _is_separator(cells) or not any(cells):
+                continue
+            rows_seen += 1
+            test_name = cells[header["test"]] if header["test"] < len(cells) else ""
+            if not test_name:
+                continue
+            unit = cells[header["unit"]] if "unit" in header and header["unit"] < len(cells) else None
+            reference = cells[header["reference"]] if "reference" in header and header["reference"] < len(cells) else None
+            row_ok = False
+            for col, day in result_columns:
+                value = cells[col] if col < len(cells) else ""
+                if not value:
+                    continue
+                row_ok = True
+                if parse_numeric_value(value) is not None:
+                    numeric += 1
+                key = day.isoformat() if day else "unknown"
+                visit = visits.setdefault(key, {"visit_date": key, "records": [], "notes": ""})
+                visit["records"].append({
+                    "test_name": test_name,
+                    "value": value,
+                    "unit": unit or "",
+                    "reference_range": reference or "",
+                })
+            rows_ok += row_ok
+
+    _attach_notes(visits, notes)
+    extraction = {
+        "petId": petId,
+        "visits": sorted(visits.values(), key=lambda v: (v["visit_date"] == "unknown", v["visit_date"])),
+    }
+    if rows_ok == 0:
+        return extraction, 0.0
+
+    values = sum(len(v["records"]) for v in visits.values())
+    confidence = rows_ok / rows_seen
+    confidence *= 0.5 + 0.5 * (numeric / values)
+    if not dated or "unknown" in visits:
+        confidence *= 0.5
+    return extraction, round(confidence, 3)
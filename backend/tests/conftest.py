@@ -0,0 +1,82 @@
+# backend/tests/conftest.py
+"""
+Shared fixtures. The app is imported against a throwaway SQLite database in a temp
+working directory (uploads and artifacts land there too) with the offline LLM backend.
+Run from the repository root: `python -m pytest backend/tests`.
+"""
+import os
+import sys
+import tempfile
+import uuid
+
+_WORKDIR = tempfile.mkdtemp(prefix="petwell-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(_WORKDIR, 'test.db')}",
+    LLM_BACKEND="fake",
+    METRICS_ENABLED="false",
+)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+os.chdir(_WORKDIR)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.database import SessionLocal
+from backend.ingest import ingest_labs
+from backend.main import app
+from backend.models import Pet, User
+from backend.security import make_token
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Entering the client runs the lifespan, which creates the schema
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def make_user(client):
+    """Create a user directly in the database; returns (user id, auth headers)."""
+    def _make(name: str = "Test User"):
+        with SessionLocal() as db:
+            user = User(name=name, email=f"{uuid.uuid4().hex}@example.com", hashed_password="!")
+            db.add(user)
+            db.commit()
+            token = make_token(str(user.id), 900, {"scope": "access", "ver": user.token_version})
+            return user.id, {"Authorization": f"Bearer {token}"}
+    return _make
+
+
+@pytest.fixture
+def make_pet(client):
+    def _make(owner_id: int, name: str = "Rex") -> int:
+        with SessionLocal() as db:
+            pet = Pet(name=name, owner_id=owner_id)
+            db.add(pet)
+            db.commit()
+            return pet.id
+    return _make
+
+
+@pytest.fixture
+def make_labs(client):
+    """Ingest visits through the normal path: {"2024-01-01": [(test, value, unit), ...], ...}."""
+    def _make(pet_id: int, visits: dict, notes: str = ""):
+        extraction = {
+            "petId": pet_id,
+            "visits": [
+                {
+                    "visit_date": day,
+                    "records": [
+                        {"test_name": name, "value": value, "unit": unit, "reference_range": ""}
+                        for name, value, unit in records
+                    ],
+                    "notes": notes,
+                }
+                for day, records in visits.items()
+            ],
+        }
+        with SessionLocal() as db:
+            return ingest_labs(db, extraction, pet_id)
+    return _make
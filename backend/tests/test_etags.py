@@ -0,0 +1,23 @@
+def test_labs_etag_revalidates_until_new_labs_arrive(client, make_user, make_pet, make_labs):
+    owner_id, _ = make_user()
+    pet_id = make_pet(owner_id)
+    make_labs(pet_id, {"2024-01-01": [("ALT", "40", "U/L")]})
+
+    first = client.get("/api/labs", params={"petId": pet_id})
+    etag = first.headers["etag"]
+    cached = client.get("/api/labs", params={"petId": pet_id}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    make_labs(pet_id, {"2024-02-01": [("ALT", "42", "U/L")]})
+    fresh = client.get("/api/labs", params={"petId": pet_id}, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+
+
+def test_pet_list_etag_changes_with_the_list(client, make_user):
+    _, headers = make_user()
+    etag = client.get("/pets", headers=headers).headers["etag"]
+    assert client.get("/pets", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    assert client.post("/pets", data={"name": "Rex"}, headers=headers).status_code == 200
+    assert client.get("/pets", headers={**headers, "If-None-Match": etag}).status_code == 200
@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import extraction_cache
+from backend.database import SessionLocal
+from backend.models import ExtractionCache
+
+
+def _rows(key):
+    with SessionLocal() as db:
+        return db.query(ExtractionCache).filter_by(kind="pdf", key=key).all()
+
+
+def test_concurrent_put_same_key(client):
+    key = extraction_cache.hash_bytes(b"concurrent put")
+
+    def _put(i):
+        extraction_cache.put("pdf", key, {"petId": 1, "labs": [], "n": i})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(_put, range(80)))
+
+    rows = _rows(key)
+    assert len(rows) == 1
+    assert extraction_cache.get("pdf", key)["labs"] == []
+
+
+def test_hits_are_recorded_with_the_next_store(client):
+    key = extraction_cache.hash_bytes(b"touch on hit")
+    extraction_cache.put("pdf", key, {"labs": []})
+    stored_at = _rows(key)[0].last_used_at
+
+    assert extraction_cache.get("pdf", key) == {"labs": []}
+    assert _rows(key)[0].last_used_at == stored_at
+
+    extraction_cache.put("pdf", extraction_cache.hash_bytes(b"another entry"), {"labs": []})
+    assert _rows(key)[0].last_used_at > stored_at
+
+
+def test_markdown_cache_hit_is_reported_as_cached(client, monkeypatch):
+    from backend import llm_parser
+
+    pages = ["| Test | Result |\n|---|---|\n| ALT | 40 |\n"]
+    monkeypatch.setattr(llm_parser, "pdf_to_pages", lambda pdf: pages)
+    md_hash = extraction_cache.hash_markdown("".join(pages))
+    extraction_cache.put("markdown", md_hash, {"visits": [], "extraction": {"path": "llm"}})
+
+    pdf_hash = extraction_cache.hash_bytes(b"re-exported report")
+    extracted, _, _ = llm_parser.convert_pdf(b"re-exported report", pdf_hash, "report")
+    assert extracted["extraction"] == {"path": "llm", "cached": True}
+    assert "cached" not in extraction_cache.get("pdf", pdf_hash)["extraction"]
@@ -0,0 +1,39 @@
+from backend.jobs import get_job_backend
+
+
+def test_job_is_only_visible_to_its_owner(client, make_user):
+    owner_id, owner_headers = make_user("Owner")
+    _, other_headers = make_user("Other")
+    job = get_job_backend().submit("test", lambda: {"labs": ["private"]}, owner_id=owner_id)
+    job.future.result(timeout=10)
+
+    res = client.get(f"/jobs/{job.id}", headers=owner_headers)
+    assert res.status_code == 200
+    assert res.json()["result"] == {"labs": ["private"]}
+    assert client.get(f"/jobs/{job.id}", headers=other_headers).status_code == 404
+    assert client.get(f"/jobs/{job.id}").status_code == 401
+    assert client.get("/jobs/stats").status_code == 401
+
+
+def test_submit_for_another_users_pet_is_rejected(client, make_user, make_pet):
+    owner_id, _ = make_user("Owner")
+    _, other_headers = make_user("Other")
+    pet_id = make_pet(owner_id)
+
+    res = client.post(
+        "/jobs/process-pdf",
+        data={"petId": pet_id},
+        files={"file": ("report.pdf", b"%PDF-1.4\n", "application/pdf")},
+        headers=other_headers,
+    )
+    assert res.status_code == 404
+
+
+def test_sync_batch_upload_requires_an_owned_pet(client, make_user, make_pet):
+    owner_id, _ = make_user("Owner")
+    _, other_headers = make_user("Other")
+    pet_id = make_pet(owner_id)
+    files = [("files", ("a.pdf", b"%PDF-1.4\n", "application/pdf")), ("files", ("b.pdf", b"%PDF-1.4\n", "application/pdf"))]
+
+    assert client.post("/process-pdf/batch", data={"petId": pet_id}, files=files).status_code == 401
+    assert client.post("/process-pdf/batch", data={"petId": pet_id}, files=files, headers=other_headers).status_code == 404
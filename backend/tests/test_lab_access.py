@@ -0,0 +1,36 @@
+import pytest
+
+
+@pytest.mark.parametrize("path", ["/api/labs/series", "/api/labs/summary", "/api/labs/export"])
+def test_pet_endpoints_hide_other_users_pets(client, make_user, make_pet, path):
+    owner_id, owner_headers = make_user("Owner")
+    _, other_headers = make_user("Other")
+    pet_id = make_pet(owner_id)
+
+    assert client.get(path, params={"petId": pet_id}, headers=owner_headers).status_code == 200
+    assert client.get(path, params={"petId": pet_id}, headers=other_headers).status_code == 404
+    assert client.get(path, params={"petId": pet_id}).status_code == 401
+
+
+def test_batch_latest_prefers_dated_visits(client, make_user, make_pet):
+    from datetime import date
+
+    from backend.database import SessionLocal
+    from backend.models import Lab
+
+    owner_id, headers = make_user()
+    pet_id = make_pet(owner_id)
+    with SessionLocal() as db:
+        db.add_all([
+            Lab(pet_id=pet_id, visit_date=date(2024, 1, 1)),
+            Lab(pet_id=pet_id, visit_date=date(2024, 6, 1)),
+            Lab(pet_id=pet_id, visit_date=None, lab_hash="undated"),
+        ])
+        db.commit()
+
+    def latest(n):
+        res = client.get("/api/labs/batch", params={"petIds": pet_id, "latest": n}, headers=headers)
+        return [v["visit_date"] for v in res.json()["pets"][0]["visits"]]
+
+    assert latest(1) == ["2024-06-01"]
+    assert latest(3) == ["2024-01-01", "2024-06-01", "unknown"]
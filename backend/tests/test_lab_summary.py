@@ -0,0 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.database import SessionLocal
+from backend.models import LabSummary
+
+
+def test_concurrent_ingests_keep_the_summary_consistent(client, make_user, make_pet, make_labs):
+    owner_id, headers = make_user()
+    pet_id = make_pet(owner_id)
+    days = [f"2024-{month:02d}-01" for month in range(1, 13)]
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        list(pool.map(lambda i: make_labs(pet_id, {days[i]: [("ALT", str(10 * (i + 1)), "U/L")]}), range(12)))
+
+    with SessionLocal() as db:
+        summary = db.query(LabSummary).filter_by(pet_id=pet_id, test_name="ALT").one()
+    assert (summary.count, summary.numeric_count) == (12, 12)
+    assert (summary.min_value, summary.max_value, summary.sum_value) == (10.0, 120.0, 780.0)
+    assert summary.latest_value == "120"
+
+    res = client.get("/api/labs/summary", params={"petId": pet_id}, headers=headers)
+    assert res.json()["tests"][0]["test_name"] == "ALT"
@@ -0,0 +1,49 @@
+import csv
+import gzip
+import io
+import json
+
+
+def _setup(make_user, make_pet, make_labs):
+    owner_id, headers = make_user()
+    pet_id = make_pet(owner_id, name="Rex")
+    make_labs(pet_id, {
+        "2024-01-01": [("ALT", "40", "U/L"), ("BUN", "20", "mg/dL")],
+        "2024-02-01": [("ALT", "45", "U/L")],
+    })
+    return pet_id, headers
+
+
+def test_csv_export(client, make_user, make_pet, make_labs):
+    pet_id, headers = _setup(make_user, make_pet, make_labs)
+    res = client.get("/api/labs/export", params={"petId": pet_id}, headers=headers)
+    assert res.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(res.text)))
+    assert [(r["visit_date"], r["test_name"], r["value"]) for r in rows] == [
+        ("2024-01-01", "ALT", "40"), ("2024-01-01", "BUN", "20"), ("2024-02-01", "ALT", "45"),
+    ]
+    assert rows[0]["pet_name"] == "Rex"
+
+
+def test_gzipped_ndjson_export_with_filters(client, make_user, make_pet, make_labs):
+    pet_id, headers = _setup(make_user, make_pet, make_labs)
+    res = client.get(
+        "/api/labs/export",
+        params={"petId": pet_id, "format": "ndjson", "gzip": "true", "tests": "ALT", "from": "2024-01-15"},
+        headers={**headers, "Accept-Encoding": "identity"},
+    )
+    assert res.status_code == 200
+    assert res.headers["content-encoding"] == "gzip"
+    body = res.content
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    records = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    assert [(r["visit_date"], r["test_name"], r["value_num"]) for r in records] == [("2024-02-01", "ALT", 45.0)]
+
+
+def test_export_without_pet_only_includes_own_pets(client, make_user, make_pet, make_labs):
+    _setup(make_user, make_pet, make_labs)
+    _, headers = make_user()
+    res = client.get("/api/labs/export", params={"format": "ndjson"}, headers=headers)
+    assert res.status_code == 200
+    assert res.text == ""
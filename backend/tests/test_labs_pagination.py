@@ -0,0 +1,21 @@
+def test_labs_cursor_walks_every_visit_once(client, make_user, make_pet, make_labs):
+    owner_id, _ = make_user()
+    pet_id = make_pet(owner_id)
+    days = ["2024-01-01", "2024-02-01", "2024-03-01", "2024-04-01", "2024-05-01"]
+    make_labs(pet_id, {day: [("ALT", "40", "U/L")] for day in days})
+
+    seen, cursor = [], None
+    while True:
+        params = {"petId": pet_id, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/labs", params=params).json()
+        seen += [v["visit_date"] for v in page["visits"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == days
+
+
+def test_labs_rejects_malformed_cursor(client):
+    assert client.get("/api/labs", params={"petId": 1, "cursor": "garbage"}).status_code == 400
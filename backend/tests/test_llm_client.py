@@ -0,0 +1,29 @@
+import threading
+import time
+
+import pytest
+
+from backend.llm_client import FakeBackend, LLMBackend, LLMClient, LLMDeadlineExceeded
+
+
+def _client(backend) -> LLMClient:
+    return LLMClient(backend, rate_per_s=100, burst=10, max_in_flight=4,
+                     max_retries=0, backoff_base_s=0.01, backoff_max_s=0.01, deadline_s=30)
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        LLMBackend()
+
+
+def test_coalesced_caller_keeps_its_own_deadline():
+    client = _client(FakeBackend(latency_s=2.0))
+    leader = threading.Thread(target=client.generate, args=("prompt", "same content"))
+    leader.start()
+    time.sleep(0.1)
+
+    started = time.monotonic()
+    with pytest.raises(LLMDeadlineExceeded):
+        client.generate("prompt", "same content", deadline_s=0.2)
+    assert time.monotonic() - started < 1.0
+    leader.join()
@@ -0,0 +1,57 @@
+import io
+
+from PIL import Image
+
+
+def _png_bytes() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_rejects_non_image_upload(client, make_user):
+    _, headers = make_user()
+    res = client.post(
+        "/pets",
+        data={"name": "Rex"},
+        files={"image": ("evil.html", b"<script>alert(1)</script>", "text/html")},
+        headers=headers,
+    )
+    assert res.status_code == 400
+    assert client.get("/pets", headers=headers).json() == []
+
+
+def test_stored_extension_comes_from_detected_format(client, make_user):
+    _, headers = make_user()
+    res = client.post(
+        "/pets",
+        data={"name": "Rex"},
+        files={"image": ("photo.html", _png_bytes(), "text/html")},
+        headers=headers,
+    )
+    assert res.status_code == 200
+    original = res.json()["images"]["original"]
+    assert original.endswith(".png")
+
+    served = client.get(original)
+    assert served.status_code == 200
+    assert served.headers["content-type"] == "image/png"
+    assert served.headers["x-content-type-options"] == "nosniff"
+
+
+def test_gc_keeps_fresh_files_until_they_age(client):
+    import os
+
+    from backend import images
+
+    os.makedirs(images.UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(images.UPLOAD_DIR, "0123456789abcdef0123.png")
+    with open(path, "wb") as f:
+        f.write(_png_bytes())
+
+    # Unreferenced, but it may belong to an upload whose transaction hasn't committed yet
+    assert images.remove_unreferenced([path]) == 0
+    assert os.path.exists(path)
+
+    assert images.remove_unreferenced([path], min_age_s=0) == 1
+    assert not os.path.exists(path)
@@ -0,0 +1,14 @@
+def test_search_finds_tests_and_notes_of_own_pets_only(client, make_user, make_pet, make_labs):
+    owner_id, headers = make_user()
+    pet_id = make_pet(owner_id)
+    make_labs(pet_id, {"2024-01-01": [("Creatinine", "1.2", "mg/dL")]}, notes="Mild lipemia noted")
+
+    hits = client.get("/api/search", params={"q": "lipem"}, headers=headers).json()["hits"]
+    assert [(h["kind"], h["petId"]) for h in hits] == [("note", pet_id)]
+
+    hits = client.get("/api/search", params={"q": "creatinine"}, headers=headers).json()["hits"]
+    assert hits[0]["kind"] == "test" and hits[0]["test"]["value"] == "1.2"
+
+    _, other_headers = make_user()
+    assert client.get("/api/search", params={"q": "creatinine"}, headers=other_headers).json()["hits"] == []
+    assert client.get("/api/search", params={"q": "x", "petId": pet_id}, headers=other_headers).status_code == 404
@@ -0,0 +1,30 @@
+from backend import table_parser
+
+REPORT = """# Reference Laboratories
+Collection Date: 01/15/2024
+
+| Test | Result | Unit | Reference Range |
+|---|---|---|---|
+| ALT | 45 | U/L | 10-100 |
+| BUN | 20 | mg/dL | 7-27 |
+| Creatinine | 1.2 | mg/dL | 0.5-1.8 |
+
+**Comments:** Mild lipemia noted.
+Recheck kidney values in 6 months.
+
+Printed 01/20/2024
+"""
+
+
+def test_table_report_keeps_notes():
+    extraction, confidence = table_parser.parse_report([REPORT], petId=1)
+    assert confidence == 1.0
+    [visit] = extraction["visits"]
+    assert visit["visit_date"] == "2024-01-15"
+    assert len(visit["records"]) == 3
+    assert visit["notes"] == "Mild lipemia noted. Recheck kidney values in 6 months."
+
+
+def test_report_without_notes_section_has_empty_notes():
+    extraction, _ = table_parser.parse_report([REPORT.split("**Comments:**")[0]], petId=1)
+    assert extraction["visits"][0]["notes"] == ""
@@ -0,0 +1,39 @@
+from backend.config import settings
+
+
+def test_declared_oversized_body_is_refused_before_parsing(client, make_user, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_IMAGE_UPLOAD_MB", 0)
+    _, headers = make_user()
+    res = client.post(
+        "/pets",
+        data={"name": "Rex"},
+        files={"image": ("big.png", b"\0" * (256 * 1024), "image/png")},
+        headers=headers,
+    )
+    assert res.status_code == 413
+    assert client.get("/pets", headers=headers).json() == []
+
+
+def test_chunked_oversized_body_is_cut_off(client, make_user, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_PDF_UPLOAD_MB", 0)
+    _, headers = make_user()
+
+    def body():
+        yield b"--x\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.pdf\"\r\n\r\n"
+        for _ in range(64):
+            yield b"\0" * 4096
+
+    res = client.post(
+        "/jobs/process-pdf",
+        content=body(),
+        headers={**headers, "Content-Type": "multipart/form-data; boundary=x"},
+    )
+    assert res.status_code == 413
+
+
+def test_other_routes_are_not_limited():
+    from backend.uploads import upload_body_limit
+
+    assert upload_body_limit("GET", "/pets") is None
+    assert upload_body_limit("POST", "/auth/login") is None
+    assert upload_body_limit("PUT", "/pets/3") is not None
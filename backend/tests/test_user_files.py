@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from backend.database import SessionLocal
+from backend.models import Document
+
+
+def _add_documents(owner_id: int, pet_id: int, count: int):
+    start = datetime(2024, 1, 1)
+    with SessionLocal() as db:
+        db.add_all([
+            Document(
+                owner_id=owner_id, pet_id=pet_id, filename=f"report-{i}", size=1024 * (i + 1),
+                content_hash=f"{owner_id}-{i}", created_at=start + timedelta(days=i),
+            )
+            for i in range(count)
+        ])
+        db.commit()
+
+
+def test_files_are_paged_and_scoped_to_the_owner(client, make_user, make_pet):
+    owner_id, headers = make_user("Owner")
+    other_id, other_headers = make_user("Other")
+    _add_documents(owner_id, make_pet(owner_id), 5)
+    _add_documents(other_id, make_pet(other_id), 2)
+
+    def page(**params):
+        res = client.get("/auth/files/user", params=params, headers=headers)
+        assert res.status_code == 200
+        return res.json()
+
+    first = page(limit=2)
+    assert first["total"] == 5
+    assert [f["title"] for f in first["items"]] == ["report-4", "report-3"]
+
+    last = page(limit=2, offset=4)
+    assert [f["title"] for f in last["items"]] == ["report-0"]
+
+    past_end = page(limit=2, offset=10)
+    assert past_end["items"] == [] and past_end["total"] == 5
+
+    by_size = page(sort="size", order="asc", limit=1)
+    assert by_size["items"][0]["title"] == "report-0"
+
+    other = client.get("/auth/files/user", headers=other_headers).json()
+    assert other["total"] == 2
@@ -0,0 +1,128 @@
+# backend/uploads.py
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from .config import settings
+
+CHUNK_SIZE = 64 * 1024
+# Room for multipart boundaries, part headers and the small form fields next to the file
+FORM_OVERHEAD_BYTES = 64 * 1024
+_MB = 1024 * 1024
+
+# (method, path pattern, body limit in bytes) for the routes that take uploads
+_UPLOAD_ROUTES = (
+    ("POST", re.compile(r"/(jobs/)?process-pdf"), lambda: settings.MAX_PDF_UPLOAD_MB * _MB),
+    ("POST", re.compile(r"/(jobs/)?process-pdf/batch"), lambda: settings.MAX_PDF_UPLOAD_MB * _MB * settings.BATCH_MAX_FILES),
+    ("POST", re.compile(r"/pets"), lambda: settings.MAX_IMAGE_UPLOAD_MB * _MB),
+    ("PUT", re.compile(r"/pets/\d+"), lambda: settings.MAX_IMAGE_UPLOAD_MB * _MB),
+)
+
+
+@dataclass
+class StoredUpload:
+    path: str
+    size: int
+    sha256: str
+    original_filename: str
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"File too large (>{max_bytes // (1024 * 1024)}MB)")
+
+
+async def stream_upload(upload: UploadFile, dest_path: str, max_bytes: int) -> StoredUpload:
+    """
+    Copy an upload to `dest_path` in fixed-size chunks, hashing as it goes.
+    The size limit is checked against the part's size and again while streaming, so an
+    oversized file is never kept. Whole request bodies are bounded earlier, before the
+    form is spooled, by UploadLimitMiddleware.
+    The file is written to a sibling ".part" path and renamed into place on success.
+    """
+    declared = getattr(upload, "size", None)
+    if declared is not None and declared > max_bytes:
+        raise _too_large(max_bytes)
+
+    part_path = dest_path + ".part"
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with open(part_path, "wb") as out:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                h.update(chunk)
+                out.write(chunk)
+        os.replace(part_path, dest_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+    return StoredUpload(path=dest_path, size=size, sha256=h.hexdigest(), original_filename=upload.filename or "")
+
+
+async def stream_upload_to_temp(upload: UploadFile, max_bytes: int, suffix: str = "") -> StoredUpload:
+    fd, temp_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        return await stream_upload(upload, temp_path, max_bytes)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def upload_body_limit(method: str, path: str) -> int | None:
+    for route_method, pattern, limit in _UPLOAD_ROUTES:
+        if method == route_method and pattern.fullmatch(path):
+            return limit() + FORM_OVERHEAD_BYTES
+    return None
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware enforcing upload size limits before the multipart form is parsed.
+    Starlette spools the whole body before UploadFile.size is known, so stream_upload's
+    checks alone would still let an oversized request fill the disk. A declared
+    Content-Length over the limit is refused with 413 before any of the body is read.
+    A body without one (chunked) is counted as it arrives and cut off the same way.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = upload_body_limit(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body too large (>{limit // _MB}MB)"
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised while FastAPI reads the form; it passes HTTPExceptions through
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,123 @@
+# backend/write_queue.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .config import settings
+from .database import SessionLocal, sqlite_production_enabled
+
+_STOP = object()
+
+
+class WriteQueue:
+    """
+    Single writer thread for SQLite. Tasks are callables taking a Session that stage
+    changes without committing; up to WRITE_BATCH_MAX queued tasks share one commit.
+    If a batch fails, it is rolled back and its tasks are replayed one commit each so
+    only the offending task sees the error.
+    """
+
+    def __init__(self, batch_max: int, batch_wait_s: float):
+        self._queue: "queue.Queue" = queue.Queue()
+        self._batch_max = batch_max
+        self._batch_wait_s = batch_wait_s
+        self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn) -> Future:
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def _next_batch(self) -> list:
+        first = self._queue.get()
+        if first is _STOP:
+            return [first]
+        batch = [first]
+        deadline = time.monotonic() + self._batch_wait_s
+        while len(batch) < self._batch_max:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is _STOP:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is _STOP
+            tasks = [item for item in batch if item is not _STOP]
+            if tasks:
+                self._run_batch(tasks)
+            if stop:
+                return
+
+    def _run_batch(self, tasks: list):
+        with SessionLocal() as db:
+            try:
+                results = [fn(db) for fn, _ in tasks]
+                db.commit()
+            except Exception:
+                db.rollback()
+            else:
+                for (_, future), result in zip(tasks, results):
+                    future.set_result(result)
+                return
+
+        for fn, future in tasks:
+            with SessionLocal() as db:
+                try:
+                    result = fn(db)
+                    db.commit()
+                    future.set_result(result)
+                except Exception as e:
+                    db.rollback()
+                    future.set_exception(e)
+
+    def stop(self):
+        self._queue.put(_STOP)
+        self._thread.join(timeout=10)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> WriteQueue:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteQueue(settings.WRITE_BATCH_MAX, settings.WRITE_BATCH_WAIT_MS / 1000)
+        return _writer
+
+
+def run_write(fn):
+    """
+    Run `fn(session)` and commit. With the SQLite production profile this goes through
+    the shared writer thread; otherwise it runs inline on a fresh session.
+    """
+    if sqlite_production_enabled():
+        return _get_writer().submit(fn).result()
+    with SessionLocal() as db:
+        try:
+            result = fn(db)
+            db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            raise
+
+
+def shutdown_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
@@ -13,6 +13,9 @@ const api = axios.create({
   timeout: 25000,
 });
 
+// Media paths from the API (e.g. pet.images.thumb) are relative to the backend
+export const mediaUrl = (path) => (path ? `${API_BASE_URL}${path}` : null);
+
 let accessToken = null;
 export const setAccessToken = (token) => {
   accessToken = token;
@@ -81,6 +84,25 @@ export const getPetById = async (id) => {
   return res.data;
 };
 
+export const getLabsBatch = async (latest) => {
+  if (!accessToken) throw new Error("No access token set");
+  const res = await api.get("/api/labs/batch", {
+    params: latest ? { latest } : {},
+    headers: { Authorization: `Bearer ${accessToken}` },
+  });
+  return res.data;
+};
+
+// Ranked matches over test names, units and visit notes across the user's pets
+export const searchLabs = async (q, petId) => {
+  if (!accessToken) throw new Error("No access token set");
+  const res = await api.get("/api/search", {
+    params: petId ? { q, petId } : { q },
+    headers: { Authorization: `Bearer ${accessToken}` },
+  });
+  return res.data;
+};
+
 export const getUserFiles = async () => {
   if (!accessToken) throw new Error("No access token set");
 
@@ -11,7 +11,7 @@ import {
 } from "react-native";
 import { useNavigation, useRoute, useFocusEffect } from "@react-navigation/native";
 import { useAuth } from "../AuthContext";
-import api from "../api";
+import api, { mediaUrl } from "../api";
 
 export default function PetProfile() {
   const navigation = useNavigation();
@@ -82,7 +82,7 @@ export default function PetProfile() {
       {/* Pet Avatar */}
       <View style={styles.avatarContainer}>
         <Image
-          source={pet.img ? { uri: pet.img } : require("../../assets/paw.png")}
+          source={pet.images ? { uri: mediaUrl(pet.images.medium) } : require("../../assets/paw.png")}
           style={styles.avatar}
         />
       </View>
@@ -13,7 +13,7 @@ import {
 import { Ionicons } from "@expo/vector-icons";
 import { useNavigation, useFocusEffect } from "@react-navigation/native";
 import { useAuth } from "../AuthContext";
-import { getPets, setAccessToken } from "../api";
+import { getPets, getLabsBatch, setAccessToken, mediaUrl } from "../api";
 
 export default function DashboardScreen() {
   const navigation = useNavigation();
@@ -50,13 +50,10 @@ export default function DashboardScreen() {
     }
   }, [accessToken]);
 
-  // Fetch lab data per pet and generate mini chart
-  const fetchLabDataAndMiniChart = async (petId) => {
+  // Generate mini chart from a pet's lab data
+  const buildMiniChartUrl = (labData) => {
     try {
-      const response = await fetch(`http://192.168.1.6:8000/api/labs?petId=${petId}`);
-      const labData = await response.json();
-
-      if (!labData || !labData.visits) return null;
+      if (!labData || !labData.visits || !labData.visits.length) return null;
 
       const metrics = {};
       labData.visits.forEach((visit) => {
@@ -89,7 +86,7 @@ export default function DashboardScreen() {
 
       return chartUrl;
     } catch (err) {
-      console.error("Error fetching lab data:", err);
+      console.error("Error building mini chart:", err);
       return null;
     }
   };
@@ -100,17 +97,22 @@ export default function DashboardScreen() {
         if (fullScreen) setInitialLoading(true);
         else setRefreshing(true);
 
-        const data = await getPets();
-        const normalized = await Promise.all(
-          (data || []).map(async (p) => {
-            const chartUrl = await fetchLabDataAndMiniChart(p.id);
-            return {
-              ...p,
-              img: p.img || p.image || null,
-              chartUrl,
-            };
-          })
-        );
+        const [data, labs] = await Promise.all([
+          getPets(),
+          getLabsBatch().catch((err) => {
+            console.error("Error fetching lab data:", err);
+            return { pets: [] };
+          }),
+        ]);
+        const labsByPet = {};
+        (labs?.pets || []).forEach((entry) => {
+          labsByPet[entry.petId] = entry;
+        });
+        const normalized = (data || []).map((p) => ({
+          ...p,
+          img: mediaUrl(p.images?.thumb) || p.img || p.image || null,
+          chartUrl: buildMiniChartUrl(labsByPet[p.id]),
+        }));
         setPets(normalized);
       } catch (err) {
         console.log("Failed to load pets:", err);
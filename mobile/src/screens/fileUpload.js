@@ -5,6 +5,7 @@ import * as DocumentPicker from "expo-document-picker";
 import * as FileSystem from "expo-file-system";
 import axios from "axios";
 import { useNavigation, useRoute } from "@react-navigation/native";
+import api from "../api";
 
 export default function FileUploadScreen() {
   const navigation = useNavigation();
@@ -14,26 +15,46 @@ export default function FileUploadScreen() {
 
   const pickFile = async () => {
     try {
-      const result = await DocumentPicker.getDocumentAsync({ type: "application/pdf" });
-      if (result.type === "cancel") return;
+      const result = await DocumentPicker.getDocumentAsync({ type: "application/pdf", multiple: true });
+      if (result.type === "cancel" || result.canceled) return;
 
-      const file = result.assets?.[0] || result;
-      let fileUri = file.uri;
-      const fileName = file.name;
+      const files = result.assets || [result];
+      const formData = new FormData();
+      for (const file of files) {
+        let fileUri = file.uri;
+        const fileName = file.name;
 
-      if (Platform.OS === "android" && fileUri.startsWith("content://")) {
-        const destPath = `${FileSystem.cacheDirectory}${fileName}`;
-        await FileSystem.copyAsync({ from: fileUri, to: destPath });
-        fileUri = destPath;
+        if (Platform.OS === "android" && fileUri.startsWith("content://")) {
+          const destPath = `${FileSystem.cacheDirectory}${fileName}`;
+          await FileSystem.copyAsync({ from: fileUri, to: destPath });
+          fileUri = destPath;
+        }
+        formData.append(files.length > 1 ? "files" : "file", { uri: fileUri, name: fileName, type: "application/pdf" });
       }
-
-      const formData = new FormData();
-      formData.append("file", { uri: fileUri, name: fileName, type: "application/pdf" });
       formData.append("petId", petId);
 
       setUploading(true);
       const backendIP = "192.168.1.6";
 
+      if (files.length > 1) {
+        // One request for the whole stack; the server overlaps conversion and extraction
+        // Authenticated through the shared client; the batch can outlast its default timeout
+        const res = await api.post("/process-pdf/batch", formData, {
+          headers: { "Content-Type": "multipart/form-data" },
+          timeout: 300000,
+        });
+        const failed = res.data.files.filter((f) => f.status !== "ok");
+        Alert.alert(
+          "Success",
+          `${res.data.totals.succeeded} of ${res.data.totals.files} files processed` +
+            (failed.length ? `\nFailed: ${failed.map((f) => f.filename).join(", ")}` : "")
+        );
+        navigation.navigate("LabResults", {
+          report: { petId, visits: res.data.files.flatMap((f) => f.result?.visits || []) },
+        });
+        return;
+      }
+
       const res = await axios.post(`http://${backendIP}:8000/process-pdf`, formData, { headers: { "Content-Type": "multipart/form-data" } });
 
       Alert.alert("Success", "File uploaded successfully!");
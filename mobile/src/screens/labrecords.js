@@ -16,10 +16,11 @@ export default function LabRecords() {
         setLoading(true);
         try {
           const data = await getUserFiles();
-          const normalized = data.map(f => ({
+          const normalized = (data.items || []).map(f => ({
+            id: f.id,
             title: f.title || "Unknown File",
             size: f.size,
-            path: f.path || null,
+            date: f.created_at,
             petId: f.petId,
           }));
           setFiles(normalized);
@@ -68,7 +69,7 @@ export default function LabRecords() {
       ) : (
         <FlatList
           data={filteredFiles}
-          keyExtractor={(item, index) => index.toString()}
+          keyExtractor={(item) => String(item.id)}
           contentContainerStyle={{ paddingHorizontal: 16 }}
           renderItem={({ item }) => (
             <View style={styles.fileRow}>